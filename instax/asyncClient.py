@@ -0,0 +1,313 @@
+"""Asyncio SP2 / SP3 Interface Classes.
+
+These mirror the command surface of the SP2 and SP3 classes as coroutines,
+using asyncio streams rather than a dedicated socket thread, so a single
+event loop can drive many printers at once.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Future
+
+from instax.exceptions import CommandTimedOutException, ConnectError
+from instax.monitor import PrintMonitor
+from instax.packet import (
+    LockStateCommand,
+    ModelNameCommand,
+    Packet,
+    PacketFactory,
+    PrepImageCommand,
+    PrePrintCommand,
+    PrintCountCommand,
+    PrinterLockCommand,
+    ResetCommand,
+    SendImageCommand,
+    SpecificationsCommand,
+    Type83Command,
+    Type195Command,
+    VersionCommand,
+)
+from instax.profile import profileCache
+from instax.status import PrinterStatus
+
+
+class AsyncSP2:
+    """Asyncio SP2 Client interface."""
+
+    modelName = "SP-2"
+
+    # Seconds to wait before each phase of a print, as in SP2.phaseDelays
+    phaseDelays = {"prePrint": 0, "lock": 1, "reset": 1, "image": 1, "status": 1}
+
+    def __init__(
+        self,
+        ip="192.168.0.251",
+        port=8080,
+        timeout=10,
+        pinCode=1111,
+        sessionMode=False,
+        phaseDelays=None,
+        trace=False,
+        printMonitor=None,
+        statusTTL=30,
+    ):
+        """Initialise the client, see SP2 for the options."""
+        self.currentTimeMillis = int(round(time.time() * 1000))
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.pinCode = pinCode
+        self.packetFactory = PacketFactory()
+        self.sessionMode = sessionMode
+        self.trace = trace
+        self.phaseDelays = dict(self.phaseDelays, **(phaseDelays or {}))
+        self.printMonitor = printMonitor or PrintMonitor()
+        self.printStarted = None
+        self.status = PrinterStatus(statusTTL)
+        self.reader = None
+        self.writer = None
+
+    async def __aenter__(self):
+        """Connect when used as an async context manager."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, excType, exc, tb):
+        """Close the connection when leaving the context manager."""
+        await self.close()
+
+    async def connect(self):
+        """Connect to a printer."""
+        logging.debug(
+            "Connecting to Instax %s with timeout of: %s on: tcp://%s:%d"
+            % (self.modelName, self.timeout, self.ip, self.port)
+        )
+        try:
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.ip, self.port), self.timeout)
+        except asyncio.TimeoutError:
+            raise (CommandTimedOutException())
+        except OSError as e:
+            raise (ConnectError(str(e)))
+
+    async def close(self):
+        """Close the connection to the Printer."""
+        logging.debug("Closing connection to Instax %s" % self.modelName)
+        if self.writer is None:
+            return
+        writer = self.writer
+        self.reader = None
+        self.writer = None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    async def send_and_recieve(self, cmdBytes, timeout):
+        """Send a command and wait for a response.
+
+        This will not check that the response is the correct command type
+        for the command.
+        """
+        if self.writer is None:
+            raise (ConnectError("Not connected"))
+        try:
+            self.writer.write(cmdBytes)
+            await self.writer.drain()
+            return await asyncio.wait_for(self.readPacket(), timeout)
+        except asyncio.TimeoutError:
+            raise (CommandTimedOutException())
+        except asyncio.IncompleteReadError:
+            raise (ConnectError("Socket Closed Prematuerly"))
+        except ValueError as e:
+            # The stream can not be trusted once the framing is lost
+            await self.close()
+            raise (ConnectError(str(e)))
+        except OSError as e:
+            raise (ConnectError(str(e)))
+
+    async def readPacket(self):
+        """Read a single length prefixed packet from the printer."""
+        header = await self.reader.readexactly(4)
+        msgLen = (header[2] & 0xFF) << 8 | (header[3] & 0xFF) << 0
+        if msgLen < 4:
+            raise ValueError("Invalid packet length: %d" % msgLen)
+        return header + await self.reader.readexactly(msgLen - 4)
+
+    async def sendCommand(self, commandPacket):
+        """Send a command packet and returns the response."""
+        encodedPacket = commandPacket.encodeCommand(self.currentTimeMillis, self.pinCode)
+        reply = await self.send_and_recieve(encodedPacket, 5)
+        decodedResponse = self.packetFactory.decode(reply)
+        if self.trace:
+            decodedResponse.printDebug()
+        self.status.observe(decodedResponse)
+        return decodedResponse
+
+    async def getPrinterVersion(self):
+        """Get the version of the Printer hardware."""
+        return await self.sendCommand(VersionCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def getPrinterModelName(self):
+        """Get the Model Name of the Printer."""
+        return await self.sendCommand(ModelNameCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def getPrintCount(self):
+        """Get the historical number of prints."""
+        return await self.sendCommand(PrintCountCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def getPrinterSpecifications(self):
+        """Get the printer specifications."""
+        return await self.sendCommand(SpecificationsCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def sendPrePrintCommand(self, cmdNumber):
+        """Send a PrePrint Command."""
+        return await self.sendCommand(PrePrintCommand(Packet.MESSAGE_MODE_COMMAND, cmdNumber=cmdNumber))
+
+    async def sendLockCommand(self, lockState):
+        """Send a Lock State Commmand."""
+        return await self.sendCommand(PrinterLockCommand(Packet.MESSAGE_MODE_COMMAND, lockState=lockState))
+
+    async def sendResetCommand(self):
+        """Send a Reset Command."""
+        return await self.sendCommand(ResetCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def sendPrepImageCommand(self, format, options, imgLength):
+        """Send a Prep for Image Command."""
+        cmdPacket = PrepImageCommand(Packet.MESSAGE_MODE_COMMAND, format=format, options=options, imgLength=imgLength)
+        return await self.sendCommand(cmdPacket)
+
+    async def sendSendImageCommand(self, sequenceNumber, payloadBytes):
+        """Send an Image Segment Command."""
+        cmdPacket = SendImageCommand(
+            Packet.MESSAGE_MODE_COMMAND, sequenceNumber=sequenceNumber, payloadBytes=payloadBytes
+        )
+        return await self.sendCommand(cmdPacket)
+
+    async def sendT83Command(self):
+        """Send a Type 83 Command."""
+        return await self.sendCommand(Type83Command(Packet.MESSAGE_MODE_COMMAND))
+
+    async def sendT195Command(self):
+        """Send a Type 195 Command."""
+        return await self.sendCommand(Type195Command(Packet.MESSAGE_MODE_COMMAND))
+
+    async def sendLockStateCommand(self):
+        """Send a LockState Command."""
+        return await self.sendCommand(LockStateCommand(Packet.MESSAGE_MODE_COMMAND))
+
+    async def getPrinterInformation(self, maxAge=None):
+        """Primary function to get printer information, see SP2."""
+        commands = self.status.getRefreshCommands(maxAge)
+        if commands:
+            connected = self.writer is not None
+            if not connected:
+                await self.connect()
+            try:
+                for command in commands:
+                    await self.sendCommand(command)
+            finally:
+                if not connected:
+                    await self.close()
+        return self.status.getInformation()
+
+    async def runPhase(self, phase, action, *args):
+        """Run one phase of a print, see SP2.runPhase."""
+        await asyncio.sleep(self.phaseDelays.get(phase, 0))
+        if not self.sessionMode:
+            await self.connect()
+            try:
+                return await action(*args)
+            finally:
+                await self.close()
+        if self.writer is None:
+            await self.connect()
+        try:
+            return await action(*args)
+        except ConnectError as e:
+            logging.info("Connection dropped during %s phase (%s), reconnecting" % (phase, e))
+            await self.close()
+            await self.connect()
+            return await action(*args)
+
+    async def prePrintPhase(self):
+        """Send the Pre Print Commands."""
+        for x in range(1, 9):
+            await self.sendPrePrintCommand(x)
+
+    async def getProfile(self):
+        """Return the transfer profile for the connected printer, see SP2."""
+        if "version" not in self.status.static:
+            await self.getPrinterVersion()
+        firmware = self.status.static["version"]["firmware"]
+        profile = profileCache.get(self.modelName, firmware)
+        if profile is None:
+            if "specs" not in self.status.static:
+                await self.getPrinterSpecifications()
+            profile = profileCache.add(self.modelName, firmware, self.status.static["specs"])
+        return profile
+
+    async def imagePhase(self, imageBytes, progress, progressTotal=100):
+        """Send the Image to the Printer."""
+        profile = await self.getProfile()
+        if len(imageBytes) != profile.frameLength:
+            raise ValueError(
+                "Image is %d bytes, the %s expects %d" % (len(imageBytes), self.modelName, profile.frameLength)
+            )
+        progress(40, progressTotal, status="About to send Image.")
+        await self.sendPrepImageCommand(16, 0, profile.frameLength)
+        for segment, segmentBytes in enumerate(SendImageCommand.iterSegments(imageBytes, profile.segmentSize)):
+            await self.sendSendImageCommand(segment, segmentBytes)
+            progress(40 + segment, progressTotal, status=("Sent image segment %s." % segment))
+        await self.sendT83Command()
+        self.printStarted = time.monotonic()
+
+    async def statusPhase(self, progress, progressTotal=100):
+        """Send Print State Requests until the print has finished."""
+        await self.sendLockStateCommand()
+        await self.getPrinterVersion()
+        await self.getPrinterModelName()
+        progress(90, progressTotal, status="Checking status of print.")
+        printStatus = await self.checkPrintStatus(30)
+        if printStatus is True:
+            progress(100, progressTotal, status="Print is complete!")
+        else:
+            progress(100, progressTotal, status="Timed out waiting for print..")
+        return printStatus
+
+    async def printPhoto(self, imageBytes, progress):
+        """Print a Photo to the Printer.
+
+        imageBytes can also be a future resolving to the encoded image, see
+        SP2.printPhoto.
+        """
+        progressTotal = 100
+        progress(10, progressTotal, status="Sending Pre Print Commands.")
+        await self.runPhase("prePrint", self.prePrintPhase)
+        progress(20, progressTotal, status="Locking Printer for Print.")
+        await self.runPhase("lock", self.sendLockCommand, 1)
+        progress(30, progressTotal, status="Resetting Printer.")
+        await self.runPhase("reset", self.sendResetCommand)
+        if isinstance(imageBytes, Future):
+            imageBytes = await asyncio.wrap_future(imageBytes)
+        elif asyncio.isfuture(imageBytes):
+            imageBytes = await imageBytes
+        await self.runPhase("image", self.imagePhase, imageBytes, progress, progressTotal)
+        progress(70, progressTotal, status="Image Print Started.")
+        try:
+            return await self.runPhase("status", self.statusPhase, progress, progressTotal)
+        finally:
+            await self.close()
+
+    async def checkPrintStatus(self, timeout=30):
+        """Check the status of a print, see SP2.checkPrintStatus."""
+        return await self.printMonitor.waitForPrintAsync(
+            self.modelName, self.sendT195Command, timeout, self.printStarted
+        )
+
+
+class AsyncSP3(AsyncSP2):
+    """Asyncio SP3 Client interface."""
+
+    modelName = "SP-3"
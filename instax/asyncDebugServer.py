@@ -0,0 +1,213 @@
+"""
+Asyncio Instax Test Server.
+
+Hosts many simulated printers in one process for load testing, for example
+a PrinterFleet of a hundred printers on a single machine. Each virtual
+printer is a DebugServer with its own state and listening socket, and
+answers commands with the same process*Command methods, but the
+connections to every printer are served by one event loop instead of a
+thread per client.
+
+Parameters:
+ - Number of printers (Default 100)
+ - Host (Default 0.0.0.0)
+ - First Port (Default 8080), each printer listens on the next port
+ - Instax SP-* version (Default 2)
+ - Network Profile: (Default none), see NetworkImpairment.profiles
+"""
+import argparse
+import asyncio
+import functools
+import signal
+import time
+
+from loguru import logger
+
+from instax.debugServer import DebugServer
+from instax.framer import PacketFramer
+from instax.impairment import NetworkImpairment, resetOnClose
+
+
+class AsyncDebugServer:
+    """Serve a set of DebugServer printers from a single event loop."""
+
+    def __init__(self, printers=()):
+        """Initialise the server with any printers that are already created."""
+        self.printers = []
+        self.servers = []
+        for printer in printers:
+            self.addPrinter(printer)
+
+    def addPrinter(self, printer=None, **printerArgs):
+        """Add a printer, creating a DebugServer from printerArgs if not given.
+
+        The printer's socket starts listening straight away, so clients can
+        connect before the event loop is running. Returns the printer.
+        """
+        if printer is None:
+            printer = DebugServer(**printerArgs)
+        printer.socket.listen(printer.backlog)
+        printer.socket.setblocking(False)
+        self.printers.append(printer)
+        return printer
+
+    def addPrinters(self, count, host="0.0.0.0", port=0, **printerArgs):
+        """Add count printers on consecutive ports starting at port.
+
+        If port is 0 every printer gets its own free port. Returns the new
+        printers.
+        """
+        return [self.addPrinter(host=host, port=(port + index) if port else 0, **printerArgs) for index in range(count)]
+
+    def getPorts(self):
+        """Return the port each printer is listening on."""
+        return [printer.socket.getsockname()[1] for printer in self.printers]
+
+    async def start(self):
+        """Start accepting connections for every printer."""
+        for printer in self.printers[len(self.servers) :]:
+            server = await asyncio.start_server(functools.partial(self.listenToClient, printer), sock=printer.socket)
+            self.servers.append(server)
+        logger.info("Serving %d virtual printers" % len(self.printers))
+
+    async def serve(self):
+        """Start the printers and serve them until cancelled."""
+        await self.start()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self.servers))
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Stop accepting connections and close the printer sockets."""
+        for server in self.servers:
+            server.close()
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+    def run(self):
+        """Run the event loop until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logger.info("Shutting down Server")
+
+    async def listenToClient(self, printer, reader, writer):
+        """Interact with a client of one printer, see DebugServer.listenToClient."""
+        printer.logger.info("New Client Connected")
+        framer = PacketFramer()
+        incoming = None
+        if printer.impairment is not None:
+            incoming = asyncio.Queue()
+            connection = printer.impairment.connect()
+            processing = asyncio.ensure_future(self.processImpaired(printer, writer, connection, incoming))
+        try:
+            while True:
+                data = await reader.read(0x10000)
+                if not data:
+                    break
+                received = time.monotonic()
+                framer.feed(data)
+                for packet in framer.packets():
+                    if incoming is not None:
+                        incoming.put_nowait((connection.uplink.transmit(len(packet), received), bytes(packet)))
+                        continue
+                    response = printer.processIncomingMessage(packet)
+                    if response is None:
+                        printer.logger.info("Dropping client connection")
+                        # Close as DebugServer does, with a FIN rather than a reset
+                        writer.close()
+                        return
+                    writer.write(response)
+                await writer.drain()
+        except ValueError as e:
+            printer.logger.warning("Dropping client sending invalid packets: %s" % e)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if incoming is not None:
+                incoming.put_nowait(None)
+                await processing
+            writer.close()
+            printer.logger.info("Client Disconnected")
+
+    async def processImpaired(self, printer, writer, connection, incoming):
+        """Process commands once they have crossed the simulated network."""
+        responses = asyncio.Queue()
+        delivery = asyncio.ensure_future(self.deliverResponses(writer, responses))
+        try:
+            while True:
+                item = await incoming.get()
+                if item is None:
+                    return
+                arrival, packet = item
+                await asyncio.sleep(max(0, arrival - time.monotonic()))
+                if connection.shouldReset():
+                    printer.logger.info("Simulating a connection reset")
+                    resetOnClose(writer.get_extra_info("socket"))
+                    writer.transport.abort()
+                    return
+                response = printer.processIncomingMessage(packet)
+                if response is None:
+                    printer.logger.info("Dropping client connection")
+                    writer.close()
+                    return
+                responses.put_nowait((connection.downlink.transmit(len(response)), response))
+        finally:
+            responses.put_nowait(None)
+            await delivery
+
+    async def deliverResponses(self, writer, responses):
+        """Send queued responses once their delay has passed."""
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            due, response = item
+            await asyncio.sleep(max(0, due - time.monotonic()))
+            if writer.is_closing():
+                return
+            try:
+                writer.write(response)
+                await writer.drain()
+            except (ConnectionError, OSError):
+                return
+
+
+if __name__ == "__main__":
+    logger.info("---------- Instax Async Test Server ---------- ")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=100, help="The number of printers to simulate, default: 100")
+    parser.add_argument("-o", "--host", default="0.0.0.0", help="The Host IP to expose the printers on.")
+    parser.add_argument(
+        "-p", "--port", type=int, default=8080, help="The port of the first printer, the rest follow, default: 8080"
+    )
+    parser.add_argument("-V", "--version", type=int, default=2, help="The Instax SP-* version, 2 or 3, default is 2")
+    parser.add_argument(
+        "-L", "--latency", type=int, default=0, help="Milliseconds to delay each response by, default: 0"
+    )
+    parser.add_argument(
+        "-N",
+        "--network",
+        choices=list(NetworkImpairment.profiles),
+        default=None,
+        help="Simulate a network profile, overrides --latency",
+    )
+    parser.add_argument("-S", "--seed", type=int, default=None, help="Random seed for the network simulation")
+    args = parser.parse_args()
+
+    asyncServer = AsyncDebugServer()
+    asyncServer.addPrinters(
+        args.count,
+        host=args.host,
+        port=args.port,
+        version=args.version,
+        latency=args.latency / 1000,
+        impairment=NetworkImpairment.fromProfile(args.network, seed=args.seed) if args.network else None,
+    )
+    logger.info("Printers listening on %s ports %s" % (args.host, asyncServer.getPorts()))
+    # Each DebugServer installs its own Ctrl+C handler, stop the event loop instead
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    asyncServer.run()
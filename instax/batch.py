@@ -0,0 +1,205 @@
+"""Batch Image Encoder.
+
+Pre-encodes a large number of images, for example for a photo wall, by
+spreading the load, convert and encode steps over a pool of worker
+processes. Encoded frames are not pickled back to the caller: each worker
+writes its frame into a shared memory block, or a file when a directory is
+given, that the caller allocated when it submitted the image. The caller
+then reads it in place. Only a few images per worker are in flight at once,
+so a batch of thousands of images does not reserve a frame for each of them
+up front.
+
+The caller owns every shared memory block. Workers started by the process
+pool share the caller's resource tracker, so before Python 3.13, where
+SharedMemory has no track argument, the registration a worker makes when it
+attaches is the same one the caller's unlink removes. Unregistering in the
+worker instead would leave the caller's unlink to fail in the tracker. A
+block is only unlinked by the tracker if the caller exits without releasing
+its frame.
+"""
+
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+from loguru import logger
+
+from instax.instaxImage import InstaxImage
+
+
+def attachSharedMemory(name):
+    """Attach to a shared memory block the caller created and will unlink."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def encodeIntoBuffer(imagePath, type, crop_type, backgroundColour, bufferName, directory):
+    """Encode an image and write it to a shared memory block or file.
+
+    This runs in a worker process, only the timings are sent back.
+    """
+    timings = {}
+    start = time.perf_counter()
+    instaxImage = InstaxImage(type=type)
+    instaxImage.loadImage(imagePath)
+    timings["load"] = time.perf_counter() - start
+    instaxImage.convertImage(crop_type=crop_type, backgroundColour=backgroundColour)
+    timings["convert"] = time.perf_counter() - start - timings["load"]
+    encodedImage = instaxImage.encodeImage()
+    timings["encode"] = time.perf_counter() - start - timings["load"] - timings["convert"]
+    if directory is None:
+        buffer = attachSharedMemory(bufferName)
+        buffer.buf[: len(encodedImage)] = encodedImage
+        buffer.close()
+    else:
+        with open(os.path.join(directory, bufferName), "r+b") as outfile:
+            outfile.write(encodedImage)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+class EncodedFrame:
+    """An encoded image produced by the BatchEncoder.
+
+    Any memoryview taken from data must be released before the frame is.
+    """
+
+    def __init__(self, imagePath, storage, length, path=None):
+        """Initialise the frame around its shared memory block or file."""
+        self.imagePath = imagePath
+        self.storage = storage
+        self.length = length
+        self.path = path
+        self.timings = {}
+        self.error = None
+
+    @property
+    def data(self):
+        """Return a memoryview over the encoded image."""
+        if self.path is None:
+            # Shared memory blocks may be rounded up to a whole page
+            return self.storage.buf[: self.length]
+        return memoryview(self.storage)
+
+    def release(self):
+        """Free the shared memory block, or delete the file."""
+        if self.storage is not None:
+            self.storage.close()
+            if self.path is None:
+                self.storage.unlink()
+            self.storage = None
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchEncoder:
+    """Encode many images at once using a pool of worker processes."""
+
+    def __init__(self, type=2, maxWorkers=None, directory=None, queueDepth=2):
+        """Initialise the encoder.
+
+        maxWorkers is capped at the number of CPUs. If directory is given the
+        encoded frames are written to files there instead of shared memory.
+        Up to queueDepth images per worker are submitted at once.
+        """
+        cpuCount = os.cpu_count() or 1
+        self.type = type
+        self.maxWorkers = min(maxWorkers or cpuCount, cpuCount)
+        self.maxInFlight = self.maxWorkers * queueDepth
+        self.directory = directory
+        printHeight, printWidth = InstaxImage.dimensions[type]
+        self.frameLength = printHeight * printWidth * 3
+        self.frameCount = 0
+        self.executor = None
+
+    def __enter__(self):
+        """Use the encoder as a context manager."""
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        """Stop the worker processes."""
+        self.shutdown()
+
+    def allocate(self):
+        """Create the shared memory block or file a frame is written to."""
+        if self.directory is None:
+            buffer = shared_memory.SharedMemory(create=True, size=self.frameLength)
+            return buffer.name, buffer
+        self.frameCount += 1
+        name = "frame-%d-%d.instax" % (os.getpid(), self.frameCount)
+        with open(os.path.join(self.directory, name), "wb") as outfile:
+            outfile.truncate(self.frameLength)
+        return name, None
+
+    def encode(self, imagePaths, crop_type="middle", backgroundColour=(255, 255, 255, 0)):
+        """Encode a list of images, yielding an EncodedFrame as each finishes.
+
+        Frames that failed to encode have their error set and no data. Call
+        release on each frame once it is no longer needed. Frames that have
+        not been yielded yet are released if the loop over them is stopped.
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.maxWorkers)
+        imagePaths = iter(imagePaths)
+        futures = {}
+        try:
+            while True:
+                for imagePath in imagePaths:
+                    self.submit(futures, imagePath, crop_type, backgroundColour)
+                    if len(futures) >= self.maxInFlight:
+                        break
+                if not futures:
+                    return
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self.collect(future, futures.pop(future))
+        finally:
+            # Stopped early, the workers still writing have to finish before their frames go
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            for frame in futures.values():
+                frame.release()
+
+    def submit(self, futures, imagePath, crop_type, backgroundColour):
+        """Allocate a frame for an image and hand it to a worker."""
+        bufferName, storage = self.allocate()
+        path = None if self.directory is None else os.path.join(self.directory, bufferName)
+        frame = EncodedFrame(imagePath, storage, self.frameLength, path)
+        try:
+            future = self.executor.submit(
+                encodeIntoBuffer, imagePath, self.type, crop_type, backgroundColour, bufferName, self.directory
+            )
+        except BaseException:
+            frame.release()
+            raise
+        futures[future] = frame
+
+    def collect(self, future, frame):
+        """Fill in a frame from its finished future."""
+        try:
+            frame.timings = future.result()
+        except Exception as e:
+            logger.warning("Failed to encode %s: %s" % (frame.imagePath, e))
+            frame.error = str(e)
+            frame.release()
+            return frame
+        if frame.path is not None:
+            try:
+                with open(frame.path, "rb") as infile:
+                    frame.storage = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            except BaseException:
+                frame.release()
+                raise
+        logger.debug("Encoded %s in %.3fs" % (frame.imagePath, frame.timings["total"]))
+        return frame
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
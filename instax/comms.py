@@ -1,6 +1,9 @@
 import queue
 import socket
 import threading
+import time
+
+from instax.framer import PacketFramer
 
 
 class ClientCommand:
@@ -49,6 +52,7 @@ class SocketClientThread(threading.Thread):
         self.alive = threading.Event()
         self.alive.set()
         self.socket = None
+        self.framer = PacketFramer()
 
         self.handlers = {
             ClientCommand.CONNECT: self._handle_CONNECT,
@@ -59,22 +63,40 @@ class SocketClientThread(threading.Thread):
 
     def run(self):
         while self.alive.is_set():
-            try:
-                # Queue.get with timeout to allow checking self.alive
-                cmd = self.cmd_q.get(True, 0.1)
-                self.handlers[cmd.type](cmd)
-            except queue.Empty:
-                continue
+            # Block until there is work to do, join() wakes us with None
+            cmd = self.cmd_q.get()
+            if cmd is None:
+                break
+            self.handlers[cmd.type](cmd)
 
     def join(self, timeout=None):
         self.alive.clear()
+        self.cmd_q.put(None)
         threading.Thread.join(self, timeout)
 
+    def waitForReply(self, timeout, skipEmpty=False):
+        """Block until a reply is available or the timeout expires.
+
+        Returns as soon as a reply is placed on reply_q, raises queue.Empty
+        if none arrives before the deadline. When skipEmpty is set, replies
+        without any data (such as a successful SEND) are discarded.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            reply = self.reply_q.get(True, remaining)
+            if skipEmpty and reply.data is None:
+                continue
+            return reply
+
     def _handle_CONNECT(self, cmd):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(5)
             self.socket.connect((cmd.data[0], cmd.data[1]))
+            self.framer.reset()
             self.reply_q.put(self._success_reply())
         except OSError as e:
             self.reply_q.put(self._error_reply(str(e)))
@@ -94,30 +116,23 @@ class SocketClientThread(threading.Thread):
 
     def _handle_RECEIVE(self, cmd):
         try:
-            header_data = self._recv_n_bytes(4)
-            if len(header_data) == 4:
-                msg_len = (header_data[2] & 0xFF) << 8 | (header_data[3] & 0xFF) << 0
-                data = self._recv_n_bytes(msg_len - 4)
-                payload = header_data + data
-                if len(payload) == msg_len:
-                    self.reply_q.put(self._success_reply(payload))
+            # Packets that arrived with an earlier one are already buffered
+            packet = self.framer.nextPacket()
+            while packet is None:
+                if self.framer.readFrom(self.socket) == 0:
+                    self.reply_q.put(self._error_reply("Socket Closed Prematuerly"))
                     return
-            self.reply_q.put(self._error_reply("Socket Closed Prematuerly"))
+                packet = self.framer.nextPacket()
+            # The view is reused by the next read, so hand over a copy
+            self.reply_q.put(self._success_reply(bytes(packet)))
+        except ValueError as e:
+            # The stream can not be trusted once the framing is lost
+            self.framer.reset()
+            self.socket.close()
+            self.reply_q.put(self._error_reply(str(e)))
         except OSError as e:
             self.reply_q.put(self._error_reply(str(e)))
 
-    def _recv_n_bytes(self, n):
-        """Convenience method for receiving excactly n bytes from
-        self.socket (assuming it's open and connected).
-        """
-        data = bytearray()
-        while len(data) < n:
-            chunk = self.socket.recv(n - len(data))
-            if chunk == b"":
-                break
-            data += chunk
-        return data
-
     def _error_reply(self, errstr):
         return ClientReply(ClientReply.ERROR, errstr)
 
@@ -14,12 +14,15 @@ Parameters:
  - Battery Level: (Default 100%)
  - Prints Remaining: (Default 10)
  - Total Prints in History: (Default 20)
+ - Network Profile: (Default none), see NetworkImpairment.profiles
 
 """
 import argparse
 import datetime
 import json
 import logging
+import os
+import queue
 import signal
 import socket
 import sys
@@ -28,6 +31,8 @@ import time
 
 from loguru import logger
 
+from instax.framer import PacketFramer
+from instax.impairment import NetworkImpairment, resetOnClose
 from instax.instaxImage import InstaxImage
 from instax.packet import (
     LockStateCommand,
@@ -50,13 +55,48 @@ from instax.packet import (
 class DebugServer:
     """A Test Server for the Instax Library."""
 
-    def __init__(self, host="0.0.0.0", port=8080, dest="images", battery=2, remaining=10, total=20, version=2):
-        """Initialise Server."""
+    # The directory decoded images are saved to when no dest is given
+    defaultDest = "images"
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=8080,
+        dest=None,
+        battery=2,
+        remaining=10,
+        total=20,
+        version=2,
+        latency=0,
+        dropSegments=(),
+        printDuration=None,
+        maxMsgSize=60000,
+        impairment=None,
+    ):
+        """Initialise Server.
+
+        latency is a delay in seconds added before each response is sent,
+        without holding up the processing of the commands behind it, so
+        pipelined clients can be measured against a simulated link.
+        dropSegments is a list of image sequenceNumbers at which the server
+        drops the connection instead of answering, once for each entry.
+        printDuration is the number of seconds a print takes after the image
+        is sent, by default a print finishes on the fifth status request.
+        maxMsgSize is the largest image segment the server reports that it
+        accepts in its specifications. impairment is a NetworkImpairment
+        simulated on every connection, when it is given latency is ignored.
+        Decoded images are saved to dest, by default defaultDest.
+        """
         self.logger = logging.getLogger("instax_server")
         self.packetFactory = PacketFactory()
         self.host = host
-        self.dest = dest
+        self.dest = dest or self.defaultDest
         self.port = port
+        self.latency = latency
+        if impairment is None and latency:
+            impairment = NetworkImpairment(downlinkDelay=latency)
+        self.impairment = impairment
+        self.dropSegments = list(dropSegments)
         self.backlog = 5
         self.returnCode = Packet.RTN_E_RCV_FRAME
         self.ejecting = 0
@@ -66,6 +106,9 @@ class DebugServer:
             self.logger.warning("Invalid Instax SP version, defaulting to SP-2")
             self.version = 2
         self.printingState = 0
+        self.printDuration = printDuration
+        self.maxMsgSize = maxMsgSize
+        self.printStarted = None
         self.battery = battery
         self.printCount = total
         self.remaining = remaining
@@ -77,6 +120,20 @@ class DebugServer:
         self.socket.bind((self.host, self.port))
         signal.signal(signal.SIGINT, self.signal_handler)
         self.imageMap = {}
+        self.handlers = {
+            Packet.MESSAGE_TYPE_PRINTER_VERSION: self.processVersionCommand,
+            Packet.MESSAGE_TYPE_SPECIFICATIONS: self.processSpecificationsCommand,
+            Packet.MESSAGE_TYPE_MODEL_NAME: self.processModelNameCommand,
+            Packet.MESSAGE_TYPE_PRINT_COUNT: self.processPrintCountCommand,
+            Packet.MESSAGE_TYPE_PRE_PRINT: self.processPrePrintCommand,
+            Packet.MESSAGE_TYPE_LOCK_DEVICE: self.processLockPrinterCommand,
+            Packet.MESSAGE_TYPE_RESET: self.processResetCommand,
+            Packet.MESSAGE_TYPE_PREP_IMAGE: self.processPrepImageCommand,
+            Packet.MESSAGE_TYPE_SEND_IMAGE: self.processSendImageCommand,
+            Packet.MESSAGE_TYPE_83: self.processType83Command,
+            Packet.MESSAGE_TYPE_195: self.processType195Command,
+            Packet.MESSAGE_TYPE_SET_LOCK_STATE: self.processSetLockStateCommand,
+        }
 
     def start(self):
         """Start the Server."""
@@ -94,25 +151,81 @@ class DebugServer:
     def listenToClient(self, client, address):
         """Interact with client."""
         self.logger.info("New Client Connected")
-        length = None
-        buffer = bytearray()
-        while True:
-            data = client.recv(70000)
-            if not data:
-                break
-            buffer += data
+        framer = PacketFramer()
+        incoming = None
+        if self.impairment is not None:
+            incoming = queue.Queue()
+            connection = self.impairment.connect()
+            threading.Thread(target=self.processImpaired, args=(client, connection, incoming), daemon=True).start()
+        try:
+            while framer.readFrom(client):
+                received = time.monotonic()
+                for packet in framer.packets():
+                    if incoming is not None:
+                        # Timestamp on arrival so a slow link does not delay the reads
+                        incoming.put((connection.uplink.transmit(len(packet), received), bytes(packet)))
+                        continue
+                    response = self.processIncomingMessage(packet)
+                    if response is None:
+                        self.logger.info("Dropping client connection")
+                        client.shutdown(socket.SHUT_RDWR)
+                        return
+                    client.sendall(response)
+        except ValueError as e:
+            self.logger.warning("Dropping client sending invalid packets: %s" % e)
+        except OSError:
+            pass
+        finally:
+            if incoming is not None:
+                # Closed by deliverResponses once the queued responses are sent
+                incoming.put(None)
+            else:
+                client.close()
+            self.logger.info("Client Disconnected")
+
+    def processImpaired(self, client, connection, incoming):
+        """Process commands once they have crossed the simulated network."""
+        responses = queue.Queue()
+        threading.Thread(target=self.deliverResponses, args=(client, responses), daemon=True).start()
+        try:
             while True:
-                if length is None:
-                    length = (buffer[2] & 0xFF) << 8 | (buffer[3] & 0xFF) << 0
-                if len(buffer) < length:
-                    break
-
-                response = self.processIncomingMessage(buffer)
-                client.send(response)
-                buffer = bytearray()
-                length = None
-                break
-        self.logger.info("Client Disconnected")
+                item = incoming.get()
+                if item is None:
+                    return
+                arrival, packet = item
+                time.sleep(max(0, arrival - time.monotonic()))
+                if connection.shouldReset():
+                    self.logger.info("Simulating a connection reset")
+                    resetOnClose(client)
+                    # Wake the reader without sending anything, it closes the socket
+                    client.shutdown(socket.SHUT_RD)
+                    return
+                response = self.processIncomingMessage(packet)
+                if response is None:
+                    self.logger.info("Dropping client connection")
+                    try:
+                        client.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    return
+                responses.put((connection.downlink.transmit(len(response)), response))
+        finally:
+            responses.put(None)
+
+    def deliverResponses(self, client, responses):
+        """Send queued responses once their delay has passed, then close the client."""
+        try:
+            while True:
+                item = responses.get()
+                if item is None:
+                    return
+                due, response = item
+                time.sleep(max(0, due - time.monotonic()))
+                client.sendall(response)
+        except OSError:
+            pass
+        finally:
+            client.close()
 
     def signal_handler(self, signal, frame):
         """Handle Ctrl+C events."""
@@ -129,14 +242,13 @@ class DebugServer:
     def decodeImage(self, segments):
         """Decode an encoded image."""
         self.logger.info("Decoding Image of %s segments." % len(segments))
-        combined = bytearray()
-        for seg_key in range(len(segments)):
-            combined += segments[seg_key]
+        combined = b"".join(segments[seg_key] for seg_key in range(len(segments)))
         self.logger.info("Combined image is %s bytes long" % len(combined))
         instaxImage = InstaxImage(type=self.version)
-        instaxImage.decodeImage(combined)
+        instaxImage.decodeImage(memoryview(combined))
         timestr = time.strftime("%Y%m%d-%H%M%S")
-        filename = timestr + ".bmp"
+        os.makedirs(self.dest, exist_ok=True)
+        filename = os.path.join(self.dest, timestr + ".bmp")
         instaxImage.saveImage(filename)
         self.logger.info("Saved image to: %s" % filename)
 
@@ -144,52 +256,43 @@ class DebugServer:
         """Print a Byte Array.
 
         Prints a Byte array in the following format: b1b2 b3b4...
+        Only the first 80 characters are kept, which 33 bytes is enough for.
         """
-        hexString = "".join("%02x" % i for i in byteArray)
+        hexString = "".join("%02x" % i for i in byteArray[:33])
         data = " ".join(hexString[i : i + 4] for i in range(0, len(hexString), 4))
         info = (data[:80] + "..") if len(data) > 80 else data
         return info
 
     def processIncomingMessage(self, payload):
-        """Take an incoming message and return the response."""
-        packetFactory = PacketFactory()
-        decodedPacket = packetFactory.decode(payload)
-        decodedPacketObj = decodedPacket.getPacketObject()
-        self.messageLog.append(decodedPacketObj)
+        """Take an incoming message and return the response.
+
+        Messages are only routed and logged here, so they are wrapped in a
+        LazyPacket and each handler decodes just the fields it uses.
+        """
+        decodedPacket = self.packetFactory.decodeLazy(payload)
+        self.messageLog.append(decodedPacket.getPacketObject())
         self.logger.info("Processing message type: %s" % decodedPacket.NAME)
         response = None
 
-        if decodedPacket.TYPE == Packet.MESSAGE_TYPE_PRINTER_VERSION:
-            response = self.processVersionCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_SPECIFICATIONS:
-            response = self.processSpecificationsCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_MODEL_NAME:
-            response = self.processModelNameCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_PRINT_COUNT:
-            response = self.processPrintCountCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_PRE_PRINT:
-            response = self.processPrePrintCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_LOCK_DEVICE:
-            response = self.processLockPrinterCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_RESET:
-            response = self.processResetCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_PREP_IMAGE:
-            response = self.processPrepImageCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_SEND_IMAGE:
-            response = self.processSendImageCommand(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_83:
-            response = self.processType83Command(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_195:
-            response = self.processType195Command(decodedPacket)
-        elif decodedPacket.TYPE == Packet.MESSAGE_TYPE_SET_LOCK_STATE:
-            response = self.processSetLockStateCommand(decodedPacket)
+        handler = self.handlers.get(decodedPacket.TYPE)
+        if handler is not None:
+            response = handler(decodedPacket)
         else:
             self.logger.info("Unknown Command. Failing!: " + str(decodedPacket.TYPE))
+        if response is None:
+            return None
 
-        decodedResponsePacket = packetFactory.decode(response)
-        self.messageLog.append(decodedResponsePacket.getPacketObject())
+        self.messageLog.append(self.packetFactory.decodeLazy(response).getPacketObject())
         return response
 
+    def registerHandler(self, packetType, handler):
+        """Register the function used to respond to a type of command.
+
+        The handler is called with the decoded command packet and should
+        return the encoded response.
+        """
+        self.handlers[packetType] = handler
+
     def processVersionCommand(self, decodedPacket):
         """Process a version command."""
         sessionTime = decodedPacket.header["sessionTime"]
@@ -208,7 +311,7 @@ class DebugServer:
             maxWidth=600,
             maxColours=256,
             unknown1=10,
-            maxMsgSize=60000,
+            maxMsgSize=self.maxMsgSize,
             unknown2=16,
             unknown3=0,
         )
@@ -275,7 +378,7 @@ class DebugServer:
     def processPrepImageCommand(self, decodedPacket):
         """Process a Prep Image Commnand."""
         sessionTime = decodedPacket.header["sessionTime"]
-        resPacket = PrepImageCommand(Packet.MESSAGE_MODE_RESPONSE, maxLen=60000)
+        resPacket = PrepImageCommand(Packet.MESSAGE_MODE_RESPONSE, maxLen=self.maxMsgSize)
         encodedResponse = resPacket.encodeResponse(
             sessionTime, self.returnCode, self.ejecting, self.battery, self.printCount
         )
@@ -285,11 +388,16 @@ class DebugServer:
         """Process a Send Image Command."""
         sessionTime = decodedPacket.header["sessionTime"]
         sequenceNumber = decodedPacket.payload["sequenceNumber"]
+        if sequenceNumber in self.dropSegments:
+            self.dropSegments.remove(sequenceNumber)
+            self.logger.info("Dropping connection at image segment %d" % sequenceNumber)
+            return None
         payloadBytes = decodedPacket.payload["payloadBytes"]
         resPacket = SendImageCommand(Packet.MESSAGE_MODE_RESPONSE, sequenceNumber=sequenceNumber)
         if sessionTime not in self.imageMap:
             self.imageMap[sessionTime] = {}
-        self.imageMap[sessionTime][sequenceNumber] = payloadBytes
+        # payloadBytes is a view over the framer buffer, so keep a copy
+        self.imageMap[sessionTime][sequenceNumber] = bytes(payloadBytes)
         encodedResponse = resPacket.encodeResponse(
             sessionTime, self.returnCode, self.ejecting, self.battery, self.printCount
         )
@@ -302,6 +410,7 @@ class DebugServer:
         encodedResponse = resPacket.encodeResponse(
             sessionTime, self.returnCode, self.ejecting, self.battery, self.printCount
         )
+        self.printStarted = time.monotonic()
         # Start a thread to decode the image
         imageSegments = self.imageMap[sessionTime]
         threading.Thread(target=self.decodeImage, args=(imageSegments,)).start()
@@ -310,7 +419,14 @@ class DebugServer:
     def processType195Command(self, decodedPacket):
         sessionTime = decodedPacket.header["sessionTime"]
         returnCode = Packet.RTN_E_PRINTING
-        if self.printingState == 100:
+        if self.printDuration is not None:
+            elapsed = time.monotonic() - (self.printStarted or 0)
+            if elapsed >= self.printDuration:
+                returnCode = Packet.RTN_E_RCV_FRAME
+            elif elapsed >= self.printDuration * 0.8:
+                # The last part of the print is spent ejecting the film
+                returnCode = Packet.RTN_E_EJECTING
+        elif self.printingState == 100:
             returnCode = Packet.RTN_E_RCV_FRAME
             self.printingState = 0
         else:
@@ -370,6 +486,24 @@ if __name__ == "__main__":
         "-t", "--total", type=int, default=20, help="The total number of prints in the printers lifetime" ", default 20"
     )
     parser.add_argument("-V", "--version", type=int, default=2, help="The Instax SP-* version, 2 or 3, default is 2")
+    parser.add_argument(
+        "-L", "--latency", type=int, default=0, help="Milliseconds to delay each response by, default: 0"
+    )
+    parser.add_argument(
+        "-N",
+        "--network",
+        choices=list(NetworkImpairment.profiles),
+        default=None,
+        help="Simulate a network profile, overrides --latency",
+    )
+    parser.add_argument("-S", "--seed", type=int, default=None, help="Random seed for the network simulation")
+    parser.add_argument(
+        "-M",
+        "--max-message",
+        type=int,
+        default=60000,
+        help="The largest image segment the printer reports it accepts, default: 60000",
+    )
     args = parser.parse_args()
 
     # Create Log Formatter
@@ -388,5 +522,8 @@ if __name__ == "__main__":
         remaining=args.remaining,
         total=args.total,
         version=args.version,
+        latency=args.latency / 1000,
+        maxMsgSize=args.max_message,
+        impairment=NetworkImpairment.fromProfile(args.network, seed=args.seed) if args.network else None,
     )
     testServer.start()
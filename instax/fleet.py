@@ -0,0 +1,304 @@
+"""Multi Printer Fleet Dispatcher.
+
+Drives a bank of SP-2 / SP-3 printers from a single queue of print jobs.
+Each printer is served by its own worker thread which takes the next job
+from the shared queue as soon as it is idle, so throughput grows with the
+number of printers. Before every job the worker refreshes the printer state
+from a VersionCommand response header, and printers that report that they
+are out of film or battery are taken out of the rotation. A printer that
+can not be reached is only skipped for a while, and probed again with an
+increasing delay, so a brief Wi-Fi dropout does not lose it for good.
+"""
+
+import queue
+import threading
+import time
+
+from loguru import logger
+
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet
+from instax.sp2 import SP2
+from instax.sp3 import SP3
+
+
+class PrintJob:
+    """A single image to be printed by the fleet.
+
+    image can be the path of an image file, or the bytes of an image that
+    has already been encoded for the printer type.
+    """
+
+    PENDING, PRINTING, COMPLETE, FAILED = range(4)
+
+    def __init__(self, image, name=None):
+        """Initialise the job."""
+        self.image = image
+        self.name = name or (image if isinstance(image, str) else "job-%d" % id(self))
+        self.state = self.PENDING
+        self.printer = None
+        self.error = None
+        self.duration = None
+        self.done = threading.Event()
+        self.encodedImages = {}
+        self.encodeLock = threading.Lock()
+        self.attempts = 0
+
+    def getEncodedImage(self, printerType):
+        """Return the encoded image for a printer type, encoding it if needed."""
+        if not isinstance(self.image, str):
+            return self.image
+        with self.encodeLock:
+            if printerType not in self.encodedImages:
+                instaxImage = InstaxImage(type=printerType)
+                instaxImage.loadImage(self.image)
+                instaxImage.convertImage()
+                self.encodedImages[printerType] = instaxImage.encodeImage()
+            return self.encodedImages[printerType]
+
+    def finish(self, state, error=None):
+        """Mark the job as finished."""
+        self.state = state
+        self.error = error
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished."""
+        return self.done.wait(timeout)
+
+
+class FleetPrinter:
+    """A printer endpoint and its last known state."""
+
+    clients = {2: SP2, 3: SP3}
+
+    # Return codes that mean the printer can not print until someone visits it
+    unavailableCodes = (Packet.RTN_E_FILM_EMPTY, Packet.RTN_E_BATTERY_EMPTY)
+
+    def __init__(self, ip, port=8080, version=2, pinCode=1111, retryDelay=1, maxRetryDelay=60, **clientArgs):
+        """Initialise the printer.
+
+        If the printer can not be reached it is not probed again for
+        retryDelay seconds, doubling after each failure up to maxRetryDelay.
+        """
+        self.ip = ip
+        self.port = port
+        self.version = version
+        self.client = self.clients[version](ip=ip, port=port, pinCode=pinCode, **clientArgs)
+        self.battery = None
+        self.printCount = None
+        self.returnCode = None
+        self.busy = False
+        self.available = True
+        self.jobsPrinted = 0
+        self.lastError = None
+        self.retryDelay = retryDelay
+        self.maxRetryDelay = maxRetryDelay
+        self.failures = 0
+        self.retryAt = 0
+
+    @property
+    def name(self):
+        """Return the printer address."""
+        return "%s:%d" % (self.ip, self.port)
+
+    def updateState(self, header):
+        """Update the printer state from a response header."""
+        self.battery = header["battery"]
+        self.printCount = header["printCount"]
+        self.returnCode = header["returnCode"]
+        if self.returnCode in self.unavailableCodes:
+            self.available = False
+
+    def refresh(self):
+        """Query the printer for its current state.
+
+        The printer is only asked if the last response received from it is
+        older than the client's statusTTL.
+        """
+        status = self.client.status
+        age = status.getAge()
+        if age is None or age > status.ttl:
+            try:
+                self.client.connect()
+                self.client.getPrinterVersion()
+            except Exception:
+                self.client.disconnect()
+                raise
+            self.client.close()
+        self.updateState(status.header)
+        self.failures = 0
+        return self.available
+
+    def unreachable(self, error):
+        """Record that the printer could not be reached, and when to try it again."""
+        self.lastError = str(error)
+        self.failures += 1
+        delay = min(self.retryDelay * 2 ** (self.failures - 1), self.maxRetryDelay)
+        self.retryAt = time.monotonic() + delay
+        return delay
+
+    def waitToRetry(self):
+        """Sleep until the printer is due to be probed again."""
+        time.sleep(max(0, self.retryAt - time.monotonic()))
+
+    def getStatus(self):
+        """Return a simple object describing the printer."""
+        return {
+            "printer": self.name,
+            "version": self.version,
+            "battery": self.battery,
+            "printCount": self.printCount,
+            "returnCode": self.returnCode,
+            "busy": self.busy,
+            "available": self.available,
+            "failures": self.failures,
+            "jobsPrinted": self.jobsPrinted,
+        }
+
+
+class PrinterFleet:
+    """Dispatch print jobs across a set of printers."""
+
+    def __init__(self, printers, maxAttempts=5):
+        """Initialise the fleet with a list of FleetPrinter objects.
+
+        A job is handed back to the queue when the printer that took it can
+        not be reached. It fails after maxAttempts hand backs if none of the
+        printers can be reached.
+        """
+        self.printers = list(printers)
+        self.maxAttempts = maxAttempts
+        self.jobs = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def submit(self, image, name=None):
+        """Queue an image for printing and return its PrintJob."""
+        job = PrintJob(image, name=name)
+        with self.lock:
+            if self.hasPrinters():
+                self.jobs.put(job)
+            else:
+                job.finish(PrintJob.FAILED, "No printers available")
+        return job
+
+    def start(self):
+        """Start one worker thread per printer."""
+        for printer in self.printers:
+            worker = threading.Thread(target=self.runPrinter, args=(printer,), daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        """Stop the workers once the jobs already queued have been handled."""
+        workers = [worker for worker in self.workers if worker.is_alive()]
+        for _ in workers:
+            self.jobs.put(None)
+        for worker in workers:
+            worker.join()
+        self.workers = []
+
+    def wait(self):
+        """Block until every submitted job has finished."""
+        self.jobs.join()
+
+    def getStatus(self):
+        """Return the state of every printer in the fleet."""
+        return [printer.getStatus() for printer in self.printers]
+
+    def hasPrinters(self):
+        """Return True if any printer has not been taken out of the rotation."""
+        return any(printer.available for printer in self.printers)
+
+    def runPrinter(self, printer):
+        """Worker loop, print jobs on a single printer until stopped.
+
+        The worker stops once its printer is out of film or battery, and
+        waits before taking another job while its printer can not be reached.
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            try:
+                if self.checkPrinter(printer):
+                    self.printJob(printer, job)
+                    continue
+                self.requeue(job, printer.lastError)
+                if not printer.available:
+                    return
+            finally:
+                self.jobs.task_done()
+            printer.waitToRetry()
+
+    def checkPrinter(self, printer):
+        """Refresh a printer's state, returning False if it should be skipped."""
+        try:
+            return printer.refresh()
+        except Exception as e:
+            delay = printer.unreachable(e)
+            logger.warning("Printer %s is unreachable (%s), trying again in %ss" % (printer.name, e, delay))
+            return False
+        finally:
+            if not printer.available:
+                logger.warning("Removing printer %s (return code: %s)" % (printer.name, printer.returnCode))
+
+    def requeue(self, job, error=None):
+        """Hand a job back to the queue, failing it if it can not be printed.
+
+        Once no printers are left every queued job is failed, so wait()
+        returns instead of waiting for workers that have stopped.
+        """
+        with self.lock:
+            if not self.hasPrinters():
+                job.finish(PrintJob.FAILED, "No printers available")
+                self.failQueued("No printers available")
+                return
+            job.attempts += 1
+            reachable = any(printer.available and not printer.failures for printer in self.printers)
+            if job.attempts >= self.maxAttempts and not reachable:
+                job.finish(PrintJob.FAILED, error or "No printers available")
+            else:
+                self.jobs.put(job)
+
+    def failQueued(self, error):
+        """Fail every job still in the queue."""
+        stops = 0
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                stops += 1
+            else:
+                job.finish(PrintJob.FAILED, error)
+            self.jobs.task_done()
+        # Leave any stop requests for the workers they were meant for
+        for _ in range(stops):
+            self.jobs.put(None)
+
+    def printJob(self, printer, job):
+        """Print a single job on a printer."""
+        logger.info("Printing %s on %s" % (job.name, printer.name))
+        job.state = PrintJob.PRINTING
+        job.printer = printer.name
+        printer.busy = True
+        start = time.monotonic()
+        try:
+            imageBytes = job.getEncodedImage(printer.version)
+            printStatus = printer.client.printPhoto(imageBytes, lambda count, total, status="": None)
+        except Exception as e:
+            printer.lastError = str(e)
+            job.finish(PrintJob.FAILED, str(e))
+            return
+        finally:
+            printer.busy = False
+            job.duration = time.monotonic() - start
+        if printStatus:
+            printer.jobsPrinted += 1
+            job.finish(PrintJob.COMPLETE)
+        else:
+            job.finish(PrintJob.FAILED, "Timed out waiting for print")
@@ -0,0 +1,105 @@
+"""Incremental Packet Framer.
+
+Every packet on the wire starts with a two byte type followed by a two byte
+big endian length that covers the whole packet. The framer reads socket data
+straight into a preallocated buffer with recv_into and yields each complete
+packet as a memoryview over that buffer, so several packets arriving in one
+recv are all handled and nothing is copied or reallocated per chunk.
+
+The views are only valid until the next call to readFrom or feed, as the
+unread bytes are moved back to the start of the buffer to make room. Copy a
+packet with bytes() if it needs to be kept for longer.
+"""
+
+
+class PacketFramer:
+    """Split a byte stream into instax packets."""
+
+    # The length field is 16 bits wide, so no packet can be bigger than this
+    MAX_PACKET_LENGTH = 0xFFFF
+    HEADER_LENGTH = 4
+    # The first byte of every command and response, see Packet.MESSAGE_MODE_*
+    START_BYTES = (0x24, 0x2A)
+
+    def __init__(self, capacity=2 * 0x10000):
+        """Initialise the framer with a buffer of capacity bytes."""
+        if capacity < self.MAX_PACKET_LENGTH:
+            raise ValueError("Framer capacity must be at least %d bytes" % self.MAX_PACKET_LENGTH)
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        """Return the number of buffered bytes that have not been framed."""
+        return self.end - self.start
+
+    def reset(self):
+        """Discard any buffered data, for example after reconnecting."""
+        self.start = 0
+        self.end = 0
+
+    def makeRoom(self, needed=MAX_PACKET_LENGTH):
+        """Move the unread bytes to the front if needed bytes do not fit after them."""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.start and self.capacity - self.end < needed:
+            pending = self.end - self.start
+            self.buffer[:pending] = self.buffer[self.start : self.end]
+            self.start = 0
+            self.end = pending
+
+    def readFrom(self, sock):
+        """Receive from a socket into the buffer.
+
+        Returns the number of bytes read, 0 means the socket was closed.
+        """
+        self.makeRoom()
+        received = sock.recv_into(self.view[self.end :])
+        self.end += received
+        return received
+
+    def feed(self, data):
+        """Add a chunk of data that was received elsewhere.
+
+        Raises BufferError if the chunk does not fit alongside the data that
+        is already buffered, read the complete packets out first.
+        """
+        data = memoryview(data)
+        self.makeRoom(len(data))
+        if self.capacity - self.end < len(data):
+            raise BufferError("Framer buffer is full, read the buffered packets first")
+        self.view[self.end : self.end + len(data)] = data
+        self.end += len(data)
+
+    def resync(self):
+        """Skip the packet at the front of the buffer up to the next likely packet start."""
+        starts = [self.buffer.find(byte, self.start + 1, self.end) for byte in self.START_BYTES]
+        self.start = min((start for start in starts if start != -1), default=self.end)
+
+    def nextPacket(self):
+        """Return the next complete packet, or None if more data is needed.
+
+        Raises ValueError if the packet has an invalid length, after skipping
+        ahead to the next likely packet start so a later call can carry on.
+        """
+        available = self.end - self.start
+        if available < self.HEADER_LENGTH:
+            return None
+        length = self.buffer[self.start + 2] << 8 | self.buffer[self.start + 3]
+        if length < self.HEADER_LENGTH:
+            self.resync()
+            raise ValueError("Invalid packet length: %d" % length)
+        if available < length:
+            return None
+        packet = self.view[self.start : self.start + length]
+        self.start += length
+        return packet
+
+    def packets(self):
+        """Yield every complete packet currently in the buffer."""
+        packet = self.nextPacket()
+        while packet is not None:
+            yield packet
+            packet = self.nextPacket()
@@ -0,0 +1,198 @@
+"""Encoded Image Cache.
+
+Reprinting the same template should not mean loading, converting and
+encoding it again. The cache keeps recently encoded frames in memory and,
+optionally, on disk as raw .instax files. Entries are keyed by a hash of the
+source file contents along with the printer type, crop mode and background
+colour, and both tiers are trimmed least recently used first once they grow
+past their size cap.
+
+Frames read back from disk are memory mapped rather than read, the mapping
+can be handed straight to printPhoto, which slices it into segments without
+copying. The mappings are backed by the page cache, so they do not count
+towards maxMemoryBytes. A mapping is closed when its file is evicted from
+the disk tier or the cache is cleared, copy it with bytes() if it needs to
+be kept for longer.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+
+class EncodedImageCache:
+    """LRU cache of encoded images, in memory and optionally on disk."""
+
+    def __init__(self, directory=None, maxMemoryBytes=64 * 1024 * 1024, maxDiskBytes=512 * 1024 * 1024):
+        """Initialise the cache.
+
+        If directory is None only the in memory tier is used.
+        """
+        self.directory = directory
+        self.maxMemoryBytes = maxMemoryBytes
+        self.maxDiskBytes = maxDiskBytes
+        self.memory = OrderedDict()
+        self.memoryBytes = 0
+        self.mapped = {}
+        # lock guards the entries, disk I/O only holds diskLock
+        self.lock = threading.Lock()
+        self.diskLock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def getKey(self, imagePath, type=2, crop_type="middle", backgroundColour=(255, 255, 255, 0)):
+        """Return the cache key for an image and its print settings."""
+        digest = hashlib.sha256()
+        with open(imagePath, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest.update(repr((type, crop_type, tuple(backgroundColour))).encode())
+        return digest.hexdigest()
+
+    def getPath(self, key):
+        """Return the on disk path for a key."""
+        return os.path.join(self.directory, key + ".instax")
+
+    def get(self, key):
+        """Return the encoded image for a key, or None if it is not cached."""
+        with self.lock:
+            encodedImage = self.memory.get(key)
+            if encodedImage is not None:
+                self.memory.move_to_end(key)
+            else:
+                encodedImage = self.mapped.get(key)
+            if encodedImage is not None:
+                self.hits += 1
+        if encodedImage is not None:
+            self.touch(key)
+            return encodedImage
+        encodedImage = self.loadFromDisk(key)
+        with self.lock:
+            if encodedImage is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if key in self.mapped:
+                # Another thread mapped the file first, use that mapping
+                encodedImage.close()
+                return self.mapped[key]
+            self.mapped[key] = encodedImage
+            return encodedImage
+
+    def put(self, key, encodedImage):
+        """Add an encoded image to the cache."""
+        with self.lock:
+            self.storeInMemory(key, encodedImage)
+        if self.directory is not None:
+            self.storeOnDisk(key, encodedImage)
+
+    def getOrEncode(self, imagePath, encoder, type=2, crop_type="middle", backgroundColour=(255, 255, 255, 0)):
+        """Return the cached encoded image, calling encoder on a miss.
+
+        encoder is called with the same arguments as this method, minus the
+        encoder itself, and should return the encoded image bytes.
+        """
+        key = self.getKey(imagePath, type, crop_type, backgroundColour)
+        encodedImage = self.get(key)
+        if encodedImage is None:
+            encodedImage = encoder(imagePath, type=type, crop_type=crop_type, backgroundColour=backgroundColour)
+            self.put(key, encodedImage)
+        return encodedImage
+
+    def clear(self):
+        """Remove every entry from the in memory tier and close the mapped files."""
+        with self.lock:
+            self.memory.clear()
+            self.memoryBytes = 0
+            mapped = list(self.mapped.values())
+            self.mapped.clear()
+        for encodedImage in mapped:
+            self.unmap(encodedImage)
+
+    def storeInMemory(self, key, encodedImage):
+        """Add an entry to the in memory tier, evicting old entries."""
+        if key in self.memory:
+            self.memoryBytes -= len(self.memory.pop(key))
+        if len(encodedImage) > self.maxMemoryBytes:
+            return
+        self.memory[key] = encodedImage
+        self.memoryBytes += len(encodedImage)
+        while self.memoryBytes > self.maxMemoryBytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memoryBytes -= len(evicted)
+
+    def loadFromDisk(self, key):
+        """Memory map an entry from disk, returns None if it is not there."""
+        if self.directory is None:
+            return None
+        path = self.getPath(key)
+        try:
+            with open(path, "rb") as infile:
+                encodedImage = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        self.touch(key)
+        return encodedImage
+
+    def unmap(self, encodedImage):
+        """Close a mapped file, unless the caller still has views of it."""
+        try:
+            encodedImage.close()
+        except BufferError:
+            logger.debug("Mapped image is still in use, leaving it open")
+
+    def touch(self, key):
+        """Mark an entry on disk as used, the disk tier is evicted by mtime.
+
+        The time is set explicitly as many filesystems only store coarse
+        timestamps, which would make recent entries indistinguishable.
+        """
+        if self.directory is None:
+            return
+        try:
+            now = time.time_ns()
+            os.utime(self.getPath(key), ns=(now, now))
+        except FileNotFoundError:
+            pass
+
+    def storeOnDisk(self, key, encodedImage):
+        """Write an entry to disk, evicting old entries."""
+        path = self.getPath(key)
+        with self.diskLock:
+            tmpPath = path + ".tmp"
+            with open(tmpPath, "wb") as outfile:
+                outfile.write(encodedImage)
+            os.replace(tmpPath, path)
+            self.touch(key)
+            self.trimDisk(keep=key + ".instax")
+
+    def trimDisk(self, keep=None):
+        """Remove the least recently used files until under maxDiskBytes.
+
+        The mappings of removed files are closed.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".instax") and name != keep:
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        totalBytes = sum(size for _, size, _ in entries)
+        if keep is not None and os.path.exists(os.path.join(self.directory, keep)):
+            totalBytes += os.path.getsize(os.path.join(self.directory, keep))
+        for _, size, name in sorted(entries):
+            if totalBytes <= self.maxDiskBytes:
+                break
+            logger.debug("Evicting %s from the image cache" % name)
+            os.remove(os.path.join(self.directory, name))
+            totalBytes -= size
+            with self.lock:
+                encodedImage = self.mapped.pop(name[: -len(".instax")], None)
+            if encodedImage is not None:
+                self.unmap(encodedImage)
@@ -0,0 +1,150 @@
+"""Simulated Network Impairment.
+
+Printers at events are reached over congested Wi-Fi rather than loopback.
+A NetworkImpairment describes such a network for the DebugServer: a one way
+delay and bandwidth cap for each direction, random jitter, occasional stalls
+where nothing gets through, and connection resets part way through a
+conversation, which are sent as a real TCP RST. Each connection gets its own pair of Links that work out when
+every packet would arrive, keeping packets in order as TCP does.
+"""
+
+import random
+import socket
+import struct
+import time
+
+
+class Link:
+    """One direction of a simulated connection."""
+
+    def __init__(self, delay=0, bandwidth=None, jitter=0, stallChance=0, stallDuration=0, rand=None):
+        """Initialise the link.
+
+        delay is the one way delay in seconds, bandwidth is in bytes per
+        second or None for no cap, and jitter is the most extra delay added
+        to any packet. Each packet has stallChance of holding up the link
+        for stallDuration seconds before it is sent.
+        """
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.jitter = jitter
+        self.stallChance = stallChance
+        self.stallDuration = stallDuration
+        self.rand = rand or random.Random()
+        self.free = 0
+        self.lastArrival = 0
+
+    def transmit(self, length, now=None):
+        """Return the time.monotonic() at which a packet sent at now arrives."""
+        if now is None:
+            now = time.monotonic()
+        start = max(now, self.free)
+        if self.stallChance and self.rand.random() < self.stallChance:
+            start += self.stallDuration
+        # Packets queue behind each other for the bandwidth, but not the delay
+        self.free = start + (length / self.bandwidth if self.bandwidth else 0)
+        arrival = self.free + self.delay + (self.rand.uniform(0, self.jitter) if self.jitter else 0)
+        self.lastArrival = max(arrival, self.lastArrival)
+        return self.lastArrival
+
+
+class ImpairedConnection:
+    """The uplink and downlink of a single simulated connection."""
+
+    def __init__(self, uplink, downlink, resetChance=0, rand=None):
+        """Initialise the connection."""
+        self.uplink = uplink
+        self.downlink = downlink
+        self.resetChance = resetChance
+        self.rand = rand or random.Random()
+
+    def shouldReset(self):
+        """Return True if the connection should be reset before the next packet."""
+        return bool(self.resetChance) and self.rand.random() < self.resetChance
+
+
+class NetworkImpairment:
+    """Network conditions to simulate on every connection to a DebugServer."""
+
+    # Named sets of conditions, bandwidths are in bytes per second
+    profiles = {
+        "loopback": {},
+        "lan": {"uplinkDelay": 0.001, "downlinkDelay": 0.001, "uplinkBandwidth": 12500000},
+        "wifi": {
+            "uplinkDelay": 0.005,
+            "downlinkDelay": 0.005,
+            "uplinkBandwidth": 2500000,
+            "downlinkBandwidth": 2500000,
+            "jitter": 0.005,
+        },
+        "congested": {
+            "uplinkDelay": 0.03,
+            "downlinkDelay": 0.02,
+            "uplinkBandwidth": 250000,
+            "downlinkBandwidth": 500000,
+            "jitter": 0.04,
+            "stallChance": 0.02,
+            "stallDuration": 0.5,
+        },
+        "flaky": {
+            "uplinkDelay": 0.01,
+            "downlinkDelay": 0.01,
+            "uplinkBandwidth": 1000000,
+            "downlinkBandwidth": 1000000,
+            "jitter": 0.02,
+            "stallChance": 0.01,
+            "stallDuration": 1,
+            "resetChance": 0.01,
+        },
+    }
+
+    def __init__(
+        self,
+        uplinkDelay=0,
+        downlinkDelay=0,
+        uplinkBandwidth=None,
+        downlinkBandwidth=None,
+        jitter=0,
+        stallChance=0,
+        stallDuration=0,
+        resetChance=0,
+        seed=None,
+    ):
+        """Initialise the impairment.
+
+        The uplink carries commands to the printer and the downlink carries
+        its responses, so the round trip time is the sum of their delays.
+        resetChance is the chance of the connection being reset instead of
+        a command being answered. Pass a seed to make a run repeatable.
+        """
+        self.uplinkDelay = uplinkDelay
+        self.downlinkDelay = downlinkDelay
+        self.uplinkBandwidth = uplinkBandwidth
+        self.downlinkBandwidth = downlinkBandwidth
+        self.jitter = jitter
+        self.stallChance = stallChance
+        self.stallDuration = stallDuration
+        self.resetChance = resetChance
+        self.rand = random.Random(seed)
+
+    @classmethod
+    def fromProfile(cls, name, **overrides):
+        """Create an impairment from one of the named profiles."""
+        if name not in cls.profiles:
+            raise ValueError("Unknown network profile %s, choose from %s" % (name, ", ".join(cls.profiles)))
+        return cls(**dict(cls.profiles[name], **overrides))
+
+    def connect(self):
+        """Return the links for a new connection."""
+        uplink = Link(
+            self.uplinkDelay, self.uplinkBandwidth, self.jitter, self.stallChance, self.stallDuration, self.rand
+        )
+        downlink = Link(
+            self.downlinkDelay, self.downlinkBandwidth, self.jitter, self.stallChance, self.stallDuration, self.rand
+        )
+        return ImpairedConnection(uplink, downlink, self.resetChance, self.rand)
+
+
+def resetOnClose(sock):
+    """Make closing a socket send a RST rather than a FIN, as a lost connection does."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
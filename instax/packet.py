@@ -4,6 +4,8 @@ This packet library can be used to encode and decode packets to be sent to
 or recieved from a Fujifilm Instax SP-2. It is designed to be used with the
 instax_api Python Library.
 """
+import struct
+
 from loguru import logger
 
 
@@ -39,6 +41,28 @@ class PacketFactory:
         hexString = "".join("%02x" % i for i in byteArray)
         return " ".join(hexString[i : i + 4] for i in range(0, len(hexString), 4))
 
+    # Packet classes keyed by their command byte, see register()
+    packetTypes = {}
+
+    @classmethod
+    def register(cls, packetClass):
+        """Register a Packet class so that it can be decoded.
+
+        The class is looked up by its TYPE, which is the command byte of the
+        packet. This can also be used as a class decorator.
+        """
+        cls.packetTypes[packetClass.TYPE] = packetClass
+        return packetClass
+
+    @classmethod
+    def unregister(cls, packetType):
+        """Remove the Packet class registered for a command byte."""
+        cls.packetTypes.pop(packetType, None)
+
+    def decodeLazy(self, byteArray):
+        """Wrap a byte array in a LazyPacket, decoding fields on demand."""
+        return LazyPacket(byteArray)
+
     def decode(self, byteArray):
         """Decode a byte array into an instax Packet."""
         self.byteArray = byteArray
@@ -47,33 +71,45 @@ class PacketFactory:
         pType = byteArray[1]
 
         # Identify the type of packet and hand over to that packets class
-        if pType == self.MESSAGE_TYPE_SPECIFICATIONS:
-            return SpecificationsCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_PRINTER_VERSION:
-            return VersionCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_PRINT_COUNT:
-            return PrintCountCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_RESET:
-            return ResetCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_PREP_IMAGE:
-            return PrepImageCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_SEND_IMAGE:
-            return SendImageCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_MODEL_NAME:
-            return ModelNameCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_PRE_PRINT:
-            return PrePrintCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_LOCK_DEVICE:
-            return PrinterLockCommand(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_83:
-            return Type83Command(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_195:
-            return Type195Command(mode=self.mode, byteArray=byteArray)
-        elif pType == self.MESSAGE_TYPE_SET_LOCK_STATE:
-            return LockStateCommand(mode=self.mode, byteArray=byteArray)
-        else:
+        packetClass = self.packetTypes.get(pType)
+        if packetClass is None:
             logger.debug("Unknown Packet Type: " + str(pType))
             logger.debug("Packet Bytes: [" + self.printRawByteArray(byteArray) + "]")
+            return None
+        return packetClass(mode=self.mode, byteArray=byteArray)
+
+
+class PacketChecksum:
+    """Running checksum over one or more buffers.
+
+    The instax checksum is the sum of every byte before the trailer, the
+    packet carries its ones' complement and a valid packet sums to 0xFFFF.
+    Buffers are summed with the builtin sum(), so the per byte work is done
+    in C rather than in a Python loop. Headers and payloads can be added with
+    separate calls to update() without joining them first.
+    """
+
+    def __init__(self, *buffers):
+        """Initialise the checksum with any number of buffers."""
+        self.total = 0
+        for buffer in buffers:
+            self.update(buffer)
+
+    def update(self, buffer):
+        """Add the bytes of a buffer to the checksum."""
+        if isinstance(buffer, memoryview) and buffer.format != "B":
+            buffer = buffer.cast("B")
+        self.total += sum(buffer)
+        return self
+
+    def complement(self):
+        """Return the two checksum bytes to append to a packet."""
+        return ((self.total ^ -1) & 0xFFFF).to_bytes(2, "big")
+
+    def matches(self, checkBytes):
+        """Check the sum against the two checksum bytes of a packet."""
+        expectedCB = self.total + (((checkBytes[0] & 0xFF) << 8) | ((checkBytes[1] & 0xFF) << 0))
+        return (expectedCB & 65535) == 65535
 
 
 class Packet:
@@ -118,6 +154,13 @@ class Packet:
 
     strings = {MESSAGE_MODE_COMMAND: "Command", MESSAGE_MODE_RESPONSE: "Response"}
 
+    # Fixed header layouts, all fields are big endian.
+    # Command:  start, command, length, session time, password, 2 empty bytes
+    # Response: start, command, length, session time, 4 empty bytes, return
+    #           code, unknown, ejecting, battery (high nibble) | prints left
+    COMMAND_HEADER = struct.Struct(">BBHIH2x")
+    RESPONSE_HEADER = struct.Struct(">BBHI4xBBBB")
+
     def __init__(self, mode=None):
         """Init for Packet."""
         pass
@@ -126,8 +169,9 @@ class Packet:
         """Print a Byte Array.
 
         Prints a Byte array in the following format: b1b2 b3b4...
+        Only the first 80 characters are kept, which 33 bytes is enough for.
         """
-        hexString = "".join("%02x" % i for i in byteArray)
+        hexString = "".join("%02x" % i for i in byteArray[:33])
         data = " ".join(hexString[i : i + 4] for i in range(0, len(hexString), 4))
         info = (data[:80] + "..") if len(data) > 80 else data
         return info
@@ -138,25 +182,29 @@ class Packet:
         return " ".join(hexString[i : i + 4] for i in range(0, len(hexString), 4))
 
     def printDebug(self):
-        """Print Debug information about packet."""
+        """Print Debug information about packet.
+
+        The fields are passed to loguru as arguments, so nothing is formatted
+        unless DEBUG messages are actually being logged.
+        """
         logger.debug("--------------------- Packet Debug Data --------------------")
-        logger.debug("Bytes: %s" % (self.printByteArray(self.byteArray)))
-        logger.debug("Mode:  %s" % (self.strings[self.mode]))
-        logger.debug("Type:  %s" % (self.NAME))
-        logger.debug("Valid: %s" % (self.valid))
+        logger.opt(lazy=True).debug("Bytes: {}", lambda: self.printByteArray(self.byteArray))
+        logger.debug("Mode:  {}", self.strings[self.mode])
+        logger.debug("Type:  {}", self.NAME)
+        logger.debug("Valid: {}", self.valid)
         logger.debug("Header:")
-        logger.debug("    Start Byte: %s" % (self.header["startByte"]))
-        logger.debug("    Command: %s" % (self.header["cmdByte"]))
-        logger.debug("    Packet Length: %s" % (self.header["packetLength"]))
-        logger.debug("    Session Time: %s" % (self.header["sessionTime"]))
+        logger.debug("    Start Byte: {}", self.header["startByte"])
+        logger.debug("    Command: {}", self.header["cmdByte"])
+        logger.debug("    Packet Length: {}", self.header["packetLength"])
+        logger.debug("    Session Time: {}", self.header["sessionTime"])
         if self.mode == self.MESSAGE_MODE_COMMAND:
-            logger.debug("    Password: %s" % (self.header["password"]))
+            logger.debug("    Password: {}", self.header["password"])
         elif self.mode == self.MESSAGE_MODE_RESPONSE:
-            logger.debug("    Return Code: %s" % (self.header["returnCode"]))
-            logger.debug("    Unknown 1: %s" % (self.header["unknown1"]))
-            logger.debug("    Ejecting: %s" % (self.header["ejecting"]))
-            logger.debug("    Battery: %s" % (self.header["battery"]))
-            logger.debug("    Prints Left: %s" % (self.header["printCount"]))
+            logger.debug("    Return Code: {}", self.header["returnCode"])
+            logger.debug("    Unknown 1: {}", self.header["unknown1"])
+            logger.debug("    Ejecting: {}", self.header["ejecting"])
+            logger.debug("    Battery: {}", self.header["battery"])
+            logger.debug("    Prints Left: {}", self.header["printCount"])
 
         if len(self.payload) == 0:
             logger.debug("Payload: None")
@@ -164,12 +212,13 @@ class Packet:
             logger.debug("Payload:")
             for key in self.payload:
                 if key == "payloadBytes":
-                    logger.debug(
-                        "    payloadBytes: (length: %s) : [%s]"
-                        % (str(len(self.payload[key])), self.printByteArray(self.payload[key]))
+                    logger.opt(lazy=True).debug(
+                        "    payloadBytes: (length: {}) : [{}]",
+                        lambda: len(self.payload["payloadBytes"]),
+                        lambda: self.printByteArray(self.payload["payloadBytes"]),
                     )
                 else:
-                    logger.debug(f"    {key} : {self.payload[key]}")
+                    logger.debug("    {} : {}", key, self.payload[key])
         logger.debug("------------------------------------------------------------")
 
     def getPacketObject(self):
@@ -188,6 +237,46 @@ class Packet:
 
     def decodeHeader(self, mode, byteArray):
         """Decode packet header."""
+        if mode == self.MESSAGE_MODE_COMMAND and len(byteArray) >= self.COMMAND_HEADER.size:
+            startByte, cmdByte, packetLength, sessionTime, password = self.COMMAND_HEADER.unpack_from(byteArray)
+            header = {
+                "startByte": startByte,
+                "cmdByte": cmdByte,
+                "packetLength": packetLength,
+                "sessionTime": sessionTime,
+                "password": password,
+            }
+        elif mode == self.MESSAGE_MODE_RESPONSE and len(byteArray) >= self.RESPONSE_HEADER.size:
+            (
+                startByte,
+                cmdByte,
+                packetLength,
+                sessionTime,
+                returnCode,
+                unknown1,
+                ejecting,
+                batteryAndPrintCount,
+            ) = self.RESPONSE_HEADER.unpack_from(byteArray)
+            header = {
+                "startByte": startByte,
+                "cmdByte": cmdByte,
+                "packetLength": packetLength,
+                "sessionTime": sessionTime,
+                "returnCode": returnCode,
+                "unknown1": unknown1,
+                "ejecting": ejecting >> 2,
+                "battery": (batteryAndPrintCount >> 4) & 7,
+                "printCount": batteryAndPrintCount & 15,
+            }
+        else:
+            header = self.decodeShortHeader(mode, byteArray)
+
+        self.header = header
+
+        return header
+
+    def decodeShortHeader(self, mode, byteArray):
+        """Decode a truncated packet header field by field."""
         startByte = self.getOneByteInt(0, byteArray)
         cmdByte = self.getOneByteInt(1, byteArray)
         packetLength = self.getTwoByteInt(2, byteArray)
@@ -204,9 +293,6 @@ class Packet:
             header["ejecting"] = self.getEjecting(14, byteArray)
             header["battery"] = self.getBatteryLevel(byteArray)
             header["printCount"] = self.getPrintCount(byteArray)
-
-        self.header = header
-
         return header
 
     def validatePacket(self, byteArray, packetLength):
@@ -216,19 +302,12 @@ class Packet:
         This is done by checking the end bytes and the checksum.
         """
         try:
-            checkSumIndex = 0
-            checkSum = 0
-            while checkSumIndex < (packetLength - 4):
-                checkSum += byteArray[checkSumIndex] & 0xFF
-                checkSumIndex += 1
+            checkSumIndex = packetLength - 4
             if (byteArray[checkSumIndex + 2] == 13) and (byteArray[checkSumIndex + 3] == 10):
-                expectedCB = checkSum + (
-                    ((byteArray[checkSumIndex] & 0xFF) << 8) | ((byteArray[checkSumIndex + 1] & 0xFF) << 0)
-                )
-                if (expectedCB & 65535) == 65535:
-                    return True
-                else:
-                    return False
+                # Sum a view of the packet rather than a copy of it
+                with memoryview(byteArray) as view:
+                    checkSum = PacketChecksum(view[:checkSumIndex])
+                    return checkSum.matches(view[checkSumIndex : checkSumIndex + 2])
             else:
                 return False
         except Exception as ex:
@@ -243,30 +322,37 @@ class Packet:
         """Generate a command.
 
         Takes Command arguments and packs them into a byteArray to be
-        sent to the Instax SP-2.
+        sent to the Instax SP-2. The payload can either be a single bytes-like
+        object or a list of them, each part is copied exactly once into a
+        preallocated packet buffer.
         """
-        self.encodedSessionTime = self.getFourByteInt(0, self.encodeFourByteInt(sessionTime))
-        commandPayloadLength = 16 + len(payload)
-        commandPayload = bytearray()
-        commandPayload.append(mode & 0xFF)  # Start of payload is 36
-        commandPayload.append(cmdType & 0xFF)  # The Command bytes
-        commandPayload = commandPayload + self.encodeTwoByteInt(commandPayloadLength)
-        commandPayload = commandPayload + self.encodeFourByteInt(sessionTime)
-        commandPayload = commandPayload + self.encodeTwoByteInt(pinCode)
-        commandPayload.append(0)  # Nothing
-        commandPayload.append(0)  # Nothing
-        if len(payload) > 0:
-            commandPayload = commandPayload + payload
-        # Generating the Checksum & End of payload
-        checkSumIndex = 0
-        checkSum = 0
-        while checkSumIndex < (commandPayloadLength - 4):
-            checkSum += commandPayload[checkSumIndex] & 0xFF
-            checkSumIndex += 1
-        commandPayload.append(((checkSum ^ -1) >> 8) & 0xFF)
-        commandPayload.append(((checkSum ^ -1) >> 0) & 0xFF)
-        commandPayload.append(13)
-        commandPayload.append(10)
+        self.encodedSessionTime = sessionTime & 0xFFFFFFFF
+        if isinstance(payload, (list, tuple)):
+            payloadParts = payload
+        else:
+            payloadParts = [payload]
+        commandPayloadLength = 16 + sum(len(part) for part in payloadParts)
+        commandPayload = bytearray(commandPayloadLength)
+        self.COMMAND_HEADER.pack_into(
+            commandPayload,
+            0,
+            mode & 0xFF,  # Start of payload is 36
+            cmdType & 0xFF,  # The Command bytes
+            commandPayloadLength,
+            self.encodedSessionTime,
+            pinCode & 0xFFFF,
+        )
+        offset = self.COMMAND_HEADER.size
+        for part in payloadParts:
+            if len(part) == 0:
+                continue
+            commandPayload[offset : offset + len(part)] = part
+            offset += len(part)
+        # Generating the Checksum & End of payload, the trailer is still zeroed
+        # so the whole buffer can be summed in one go.
+        commandPayload[offset : offset + 2] = PacketChecksum(commandPayload).complement()
+        commandPayload[offset + 2] = 13
+        commandPayload[offset + 3] = 10
         return commandPayload
 
     def generateResponse(self, mode, cmdType, sessionTime, payload, returnCode, ejectState, battery, printCount):
@@ -275,39 +361,44 @@ class Packet:
         Takes Response arguments and packs them into a byteArray to be
         sent to the Instax-SP2.
         """
-        self.encodedSessionTime = self.getFourByteInt(0, self.encodeFourByteInt(sessionTime))
-        responsePayloadLength = 20 + len(payload)
-        responsePayload = bytearray()
-        responsePayload.append(mode & 0xFF)  # Start of payload is 42
-        responsePayload.append(cmdType & 0xFF)  # The Response type bytes
-        responsePayload = responsePayload + self.encodeTwoByteInt(responsePayloadLength)
-        responsePayload = responsePayload + self.encodeFourByteInt(sessionTime)
-        responsePayload = responsePayload + bytearray(4)
-        responsePayload = responsePayload + self.encodeOneByteInt(returnCode)
-        responsePayload.append(0)  # Nothing
-        responsePayload = responsePayload + self.encodeEjecting(0)
-        responsePayload = responsePayload + self.encodeBatteryAndPrintCount(battery, printCount)
-
+        self.encodedSessionTime = sessionTime & 0xFFFFFFFF
+        headerSize = self.RESPONSE_HEADER.size
+        responsePayloadLength = headerSize + len(payload) + 4
+        responsePayload = bytearray(responsePayloadLength)
+        self.RESPONSE_HEADER.pack_into(
+            responsePayload,
+            0,
+            mode & 0xFF,  # Start of payload is 42
+            cmdType & 0xFF,  # The Response type bytes
+            responsePayloadLength,
+            self.encodedSessionTime,
+            returnCode & 0xFF,
+            0,  # Nothing
+            0,  # Ejecting
+            (battery << 4) | printCount << 0,
+        )
         if len(payload) > 0:
-            responsePayload = responsePayload + payload
-        # Generating the Checksum & End of payload
-        checkSumIndex = 0
-        checkSum = 0
-        while checkSumIndex < (responsePayloadLength - 4):
-            checkSum += responsePayload[checkSumIndex] & 0xFF
-            checkSumIndex += 1
-        responsePayload.append(((checkSum ^ -1) >> 8) & 0xFF)
-        responsePayload.append(((checkSum ^ -1) >> 0) & 0xFF)
-        responsePayload.append(13)
-        responsePayload.append(10)
+            responsePayload[headerSize : headerSize + len(payload)] = payload
+        # Generating the Checksum & End of payload, the trailer is still zeroed
+        responsePayload[-4:-2] = PacketChecksum(responsePayload).complement()
+        responsePayload[-2] = 13
+        responsePayload[-1] = 10
         return responsePayload
 
     def encodeCommand(self, sessionTime, pinCode):
         """Encode a command packet into a byteArray."""
-        payload = self.encodeComPayload()
+        payload = self.encodeComPayloadParts()
         encodedPacket = self.generateCommand(self.mode, self.TYPE, sessionTime, payload, pinCode)
         return encodedPacket
 
+    def encodeComPayloadParts(self):
+        """Return the Command payload as a list of bytes-like parts.
+
+        Packets carrying large payloads can override this to avoid joining
+        the parts together before they are copied into the packet.
+        """
+        return [self.encodeComPayload()]
+
     def encodeResponse(self, sessionTime, returnCode, ejectState, battery, printCount):
         """Encode a response packet into a byteArray."""
         payload = self.encodeRespPayload()
@@ -419,6 +510,105 @@ class Packet:
         return byteArray[offset : offset + length]
 
 
+class LazyPacket:
+    """Lightweight view over an encoded packet.
+
+    Only a memoryview over the wire buffer is kept, the header, payload and
+    checksum are each decoded the first time they are asked for. This makes
+    it cheap to scan through many packets when only a few fields are needed.
+    Payload bytes, such as those of a Send Image command, are returned as
+    views over the original buffer rather than copies.
+    """
+
+    __slots__ = ("view", "packet", "decodedHeader", "decodedPayload", "checked")
+
+    def __init__(self, byteArray):
+        """Wrap an encoded packet without decoding it."""
+        self.view = memoryview(byteArray)
+        self.packet = None
+        self.decodedHeader = None
+        self.decodedPayload = None
+        self.checked = None
+
+    @property
+    def mode(self):
+        """Return the start byte, which gives the packet direction."""
+        return self.view[0]
+
+    @property
+    def TYPE(self):
+        """Return the command byte."""
+        return self.view[1]
+
+    @property
+    def NAME(self):
+        """Return the name of the packet type."""
+        packetClass = PacketFactory.packetTypes.get(self.TYPE)
+        return "Unknown" if packetClass is None else packetClass.NAME
+
+    @property
+    def packetLength(self):
+        """Return the packet length from the header."""
+        return ((self.view[2] & 0xFF) << 8) | (self.view[3] & 0xFF)
+
+    @property
+    def header(self):
+        """Return the decoded header, decoding it on first access."""
+        if self.decodedHeader is None:
+            self.decodedHeader = self.getPacket().decodeHeader(self.mode, self.view)
+        return self.decodedHeader
+
+    @property
+    def payload(self):
+        """Return the decoded payload, decoding it on first access."""
+        if self.decodedPayload is None:
+            packet = self.getPacket()
+            packet.header = self.header
+            decoded = {}
+            if type(packet) is not Packet:
+                if self.mode == Packet.MESSAGE_MODE_COMMAND:
+                    decoded = packet.decodeComPayload(self.view)
+                elif self.mode == Packet.MESSAGE_MODE_RESPONSE:
+                    decoded = packet.decodeRespPayload(self.view)
+            self.decodedPayload = decoded
+        return self.decodedPayload
+
+    @property
+    def valid(self):
+        """Validate the end bytes and checksum, on first access only."""
+        if self.checked is None:
+            self.checked = self.getPacket().validatePacket(self.view, self.packetLength) is True
+        return self.checked
+
+    def getPacket(self):
+        """Return an undecoded instance of the registered packet class."""
+        if self.packet is None:
+            packetClass = PacketFactory.packetTypes.get(self.TYPE, Packet)
+            packet = packetClass.__new__(packetClass)
+            packet.mode = self.mode
+            packet.byteArray = self.view
+            packet.payload = {}
+            self.packet = packet
+        return self.packet
+
+    def decode(self):
+        """Fully decode the packet into its Packet class."""
+        return PacketFactory().decode(self.view)
+
+    def getPacketObject(self):
+        """Return the same simple object as Packet.getPacketObject."""
+        packet = self.getPacket()
+        packet.header = self.header
+        packet.payload = self.payload
+        return packet.getPacketObject()
+
+    def release(self):
+        """Release the view over the wire buffer."""
+        self.packet = None
+        self.view.release()
+
+
+@PacketFactory.register
 class SpecificationsCommand(Packet):
     """Specifications Command and Response."""
 
@@ -510,6 +700,7 @@ class SpecificationsCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class VersionCommand(Packet):
     """Version Command."""
 
@@ -568,6 +759,7 @@ class VersionCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class PrintCountCommand(Packet):
     """Print Count Command."""
 
@@ -620,6 +812,7 @@ class PrintCountCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class ModelNameCommand(Packet):
     """Model Name Command."""
 
@@ -671,6 +864,7 @@ class ModelNameCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class PrePrintCommand(Packet):
     """Pre Print Command."""
 
@@ -724,6 +918,7 @@ class PrePrintCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class PrinterLockCommand(Packet):
     """Printer Lock Command."""
 
@@ -770,6 +965,7 @@ class PrinterLockCommand(Packet):
         return {}
 
 
+@PacketFactory.register
 class ResetCommand(Packet):
     """Reset Command."""
 
@@ -809,6 +1005,7 @@ class ResetCommand(Packet):
         return {}
 
 
+@PacketFactory.register
 class PrepImageCommand(Packet):
     """Prep Image Command."""
 
@@ -868,6 +1065,7 @@ class PrepImageCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class SendImageCommand(Packet):
     """Send Image Command."""
 
@@ -899,6 +1097,24 @@ class SendImageCommand(Packet):
         payload = payload + self.payloadBytes
         return payload
 
+    def encodeComPayloadParts(self):
+        """Return the Command Payload without copying the image segment."""
+        return [self.encodeFourByteInt(self.sequenceNumber), self.payloadBytes]
+
+    @staticmethod
+    def iterSegments(imageBytes, segmentSize=60000):
+        """Split an encoded image into segments.
+
+        Yields memoryview slices over the encoded image, so no image bytes are
+        copied until the segment is written into its packet.
+        """
+        try:
+            imageView = memoryview(imageBytes)
+        except TypeError:
+            imageView = memoryview(bytes(imageBytes))
+        for start in range(0, len(imageView), segmentSize):
+            yield imageView[start : start + segmentSize]
+
     def decodeComPayload(self, byteArray):
         """Decode the Command Payload."""
         self.sequenceNumber = self.getFourByteInt(12, byteArray)
@@ -920,6 +1136,7 @@ class SendImageCommand(Packet):
         return self.payload
 
 
+@PacketFactory.register
 class Type83Command(Packet):
     """Type 83 Command."""
 
@@ -959,6 +1176,7 @@ class Type83Command(Packet):
         return {}
 
 
+@PacketFactory.register
 class Type195Command(Packet):
     """Type 195 Command."""
 
@@ -998,6 +1216,7 @@ class Type195Command(Packet):
         return {}
 
 
+@PacketFactory.register
 class LockStateCommand(Packet):
     """LockState Command."""
 
@@ -0,0 +1,48 @@
+"""Print Pipeline.
+
+Loading, fitting and encoding an image does not depend on the printer, so
+it can run in a worker while the pre print, lock and reset commands are
+exchanged with the printer. printPhoto waits on the encoded image only when
+it is about to send it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from instax.instaxImage import InstaxImage
+
+
+def encodeImageFile(imagePath, type=2, crop_type="middle", backgroundColour=(255, 255, 255, 0)):
+    """Load, convert and encode an image file for the given printer type."""
+    instaxImage = InstaxImage(type=type)
+    instaxImage.loadImage(imagePath)
+    instaxImage.convertImage(crop_type=crop_type, backgroundColour=backgroundColour)
+    return instaxImage.encodeImage()
+
+
+class PrintPipeline:
+    """Overlap image preparation with the printer handshake."""
+
+    def __init__(self, printer, type=2, executor=None, cache=None):
+        """Initialise the pipeline for an SP2 or SP3 client.
+
+        If an EncodedImageCache is given, images that have been encoded
+        before are taken from the cache instead of being encoded again.
+        """
+        self.printer = printer
+        self.type = type
+        self.cache = cache
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="instax-encode")
+
+    def submitImage(self, imagePath):
+        """Start encoding an image in the worker, returns a Future."""
+        if self.cache is not None:
+            return self.executor.submit(self.cache.getOrEncode, imagePath, encodeImageFile, type=self.type)
+        return self.executor.submit(encodeImageFile, imagePath, self.type)
+
+    def printImage(self, imagePath, progress):
+        """Encode and print an image, returns True once the print is complete."""
+        return self.printer.printPhoto(self.submitImage(imagePath), progress)
+
+    def shutdown(self):
+        """Stop the encoding worker."""
+        self.executor.shutdown()
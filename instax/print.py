@@ -18,6 +18,7 @@ import sys
 from loguru import logger
 
 from instax.instaxImage import InstaxImage
+from instax.pipeline import PrintPipeline
 from instax.sp2 import SP2
 from instax.sp3 import SP3
 
@@ -66,6 +67,13 @@ if __name__ == "__main__":
         choices=[1, 2, 3],
         help="The version of Instax Printer to use (1, 2 or 3). Default is 2 (SP-2).",
     )
+    parser.add_argument(
+        "-w",
+        "--window",
+        type=int,
+        default=1,
+        help="The number of image segments to send before waiting for a response. Default is 1.",
+    )
     parser.add_argument("image", help="The location of the image to print.")
     args = parser.parse_args()
 
@@ -87,11 +95,25 @@ if __name__ == "__main__":
         # TODO - Need to find an SP-2 to test with.
     elif args.version == 2:
         logger.info("Attempting to print to an Instax SP-2 printer.")
-        myInstax = SP2(ip=args.host, port=args.port, pinCode=args.pin, timeout=args.timeout)
+        myInstax = SP2(
+            ip=args.host,
+            port=args.port,
+            pinCode=args.pin,
+            timeout=args.timeout,
+            trace=args.debug,
+            imageWindow=args.window,
+        )
     elif args.version == 3:
         logger.info("Attempting to print to an Instax SP-3 printer.")
         # Warning, this does not work in production yet.
-        myInstax = SP3(ip=args.host, port=args.port, pinCode=args.pin, timeout=args.timeout)
+        myInstax = SP3(
+            ip=args.host,
+            port=args.port,
+            pinCode=args.pin,
+            timeout=args.timeout,
+            trace=args.debug,
+            imageWindow=args.window,
+        )
     else:
         logger.error("Invalid Instax printer version given")
         exit(1)
@@ -106,22 +128,18 @@ if __name__ == "__main__":
         logger.info("Preview complete, exiting.")
         exit(0)
     else:
+        # Start encoding the image in the background while we talk to the printer
+        pipeline = PrintPipeline(myInstax, type=args.version)
+        encodedImage = pipeline.submitImage(args.image)
+
         # Attempt print
         logger.info("Connecting to Printer.")
         info = myInstax.getPrinterInformation()
         printPrinterInfo(info)
 
         logger.info("Printing Image: %s" % args.image)
-        # Initialize The Instax Image
-        instaxImage = InstaxImage(type=args.version)
-        instaxImage.loadImage(args.image)
-        instaxImage.convertImage()
-        # Save a copy of the converted bitmap
-        # instaxImage.saveImage("test.bmp")
-        # Preview the image that is about to print
-        # instaxImage.previewImage()
-        encodedImage = instaxImage.encodeImage()
         myInstax.printPhoto(encodedImage, printProgress)
+        pipeline.shutdown()
         logger.info("Thank you for using instax-print!")
         logger.info(
             r"""
@@ -0,0 +1,104 @@
+"""Printer Transfer Profiles.
+
+The size of the image a printer expects, and the largest segment of it that
+can be sent in one SendImageCommand, are reported by the printer in its
+SpecificationsCommand response. A PrinterProfile turns those into the frame
+length and segments used to send an image, so a printer that accepts larger
+messages is sent fewer segments. Profiles are cached for each model and
+firmware version, so the specifications only need to be asked for once.
+"""
+
+import math
+import threading
+
+from loguru import logger
+
+from instax.instaxImage import InstaxImage
+
+# The packet length is a two byte field, and a SendImageCommand adds 20 bytes
+# of header, sequence number and checksum to each segment.
+MAX_SEGMENT_SIZE = 0xFFFF - 20
+
+# The InstaxImage type printed by each model
+imageTypes = {"SP-2": 2, "SP-3": 3}
+
+
+class PrinterProfile:
+    """Image size and segmenting for a printer model and firmware."""
+
+    def __init__(self, modelName, maxWidth, maxHeight, maxMsgSize, firmware=None):
+        """Initialise the profile from the printer specifications."""
+        self.modelName = modelName
+        self.firmware = firmware
+        self.maxWidth = maxWidth
+        self.maxHeight = maxHeight
+        self.frameLength = maxWidth * maxHeight * 3
+        self.segmentSize = min(maxMsgSize, MAX_SEGMENT_SIZE)
+        self.segmentCount = math.ceil(self.frameLength / self.segmentSize)
+
+    def __repr__(self):
+        """Return a readable description of the profile."""
+        return "PrinterProfile(%s, firmware=%s, %dx%d, %d segments of %d bytes)" % (
+            self.modelName,
+            self.firmware,
+            self.maxWidth,
+            self.maxHeight,
+            self.segmentCount,
+            self.segmentSize,
+        )
+
+    @classmethod
+    def fromSpecifications(cls, modelName, specs, firmware=None):
+        """Create a profile from a SpecificationsCommand payload.
+
+        Returns None if the specifications are missing any of the sizes, or
+        if the image size does not match the InstaxImage the model prints.
+        """
+        if not (specs.get("maxWidth") and specs.get("maxHeight") and specs.get("maxMsgSize")):
+            return None
+        if modelName in imageTypes:
+            dimensions = InstaxImage.dimensions[imageTypes[modelName]]
+            if sorted((specs["maxWidth"], specs["maxHeight"])) != sorted(dimensions):
+                return None
+        return cls(modelName, specs["maxWidth"], specs["maxHeight"], specs["maxMsgSize"], firmware)
+
+
+# Used when a printer does not report usable specifications
+defaultProfiles = {
+    "SP-2": PrinterProfile("SP-2", 600, 800, 60000),
+    "SP-3": PrinterProfile("SP-3", 800, 800, 60000),
+}
+
+
+class ProfileCache:
+    """Profiles for each model and firmware version seen so far."""
+
+    def __init__(self):
+        """Initialise an empty cache."""
+        self.profiles = {}
+        self.lock = threading.Lock()
+
+    def get(self, modelName, firmware):
+        """Return the cached profile for a model and firmware, or None."""
+        with self.lock:
+            return self.profiles.get((modelName, firmware))
+
+    def add(self, modelName, firmware, specs):
+        """Create a profile from a SpecificationsCommand payload and cache it."""
+        profile = PrinterProfile.fromSpecifications(modelName, specs, firmware)
+        if profile is None:
+            logger.warning("Unusable specifications from %s %s, using defaults: %s" % (modelName, firmware, specs))
+            profile = defaultProfiles[modelName]
+        logger.debug("Negotiated %s" % profile)
+        with self.lock:
+            self.profiles[(modelName, firmware)] = profile
+        return profile
+
+    def clear(self):
+        """Forget every cached profile."""
+        with self.lock:
+            self.profiles.clear()
+
+
+# Shared by every client, so each firmware only has to be asked once
+profileCache = ProfileCache()
@@ -1,11 +1,17 @@
-"""Main SP2 Interface Class."""
+"""Main SP2 Interface Class.
+
+The SP3 class shares this implementation, only the model name differs.
+"""
 
 import logging
 import queue
+import socket
 import time
+from concurrent.futures import Future
 
 from instax.comms import ClientCommand, ClientReply, SocketClientThread
-from instax.exceptions import CommandTimedOutException, ConnectError
+from instax.exceptions import CommandError, CommandTimedOutException, ConnectError
+from instax.monitor import PrintMonitor
 from instax.packet import (
     LockStateCommand,
     ModelNameCommand,
@@ -22,40 +28,88 @@ from instax.packet import (
     Type195Command,
     VersionCommand,
 )
+from instax.profile import profileCache
+from instax.status import PrinterStatus
+from instax.transfer import ImageTransfer
 
 
 class SP2:
     """SP2 Client interface."""
 
-    def __init__(self, ip="192.168.0.251", port=8080, timeout=10, pinCode=1111):
-        """Initialise the client."""
-        logging.debug("Initialising Instax SP-2 Class")
+    modelName = "SP-2"
+
+    # Seconds to wait before each phase of a print, these can be tuned per
+    # printer using the phaseDelays argument.
+    phaseDelays = {"prePrint": 0, "lock": 1, "reset": 1, "image": 1, "status": 1}
+
+    def __init__(
+        self,
+        ip="192.168.0.251",
+        port=8080,
+        timeout=10,
+        pinCode=1111,
+        sessionMode=False,
+        phaseDelays=None,
+        trace=False,
+        imageWindow=1,
+        resumeAttempts=1,
+        printMonitor=None,
+        statusTTL=30,
+        sessionRetries=1,
+        commandTimeout=5,
+    ):
+        """Initialise the client.
+
+        When sessionMode is set, printPhoto keeps a single connection open
+        for every phase of the print and only reconnects if the printer
+        drops it, up to sessionRetries times for each phase. When trace is
+        set, every command and response is decoded and logged at DEBUG
+        level. imageWindow is the number of image segments that may be sent
+        before waiting for their responses. If the connection drops or the
+        printer stops answering for commandTimeout seconds while sending the
+        image, it is resumed from the last acknowledged segment up to
+        resumeAttempts times. printMonitor is the PrintMonitor used to wait
+        for prints, by default one for this client alone, pass the same one
+        to several clients to share the print times it learns. The battery
+        level and print counts returned by getPrinterInformation are cached
+        for statusTTL seconds.
+        """
+        logging.debug("Initialising Instax %s Class" % self.modelName)
         self.currentTimeMillis = int(round(time.time() * 1000))
         self.ip = ip
         self.port = port
         self.timeout = 10
         self.pinCode = pinCode
         self.packetFactory = PacketFactory()
+        self.sessionMode = sessionMode
+        self.trace = trace
+        self.imageWindow = imageWindow
+        self.resumeAttempts = resumeAttempts
+        self.sessionRetries = sessionRetries
+        self.commandTimeout = commandTimeout
+        self.transfer = None
+        self.profile = None
+        self.printMonitor = printMonitor or PrintMonitor()
+        self.printStarted = None
+        self.status = PrinterStatus(statusTTL)
+        self.phaseDelays = dict(self.phaseDelays, **(phaseDelays or {}))
+        self.comms = None
 
     def connect(self):
         """Connect to a printer."""
-        logging.debug("Connecting to Instax SP-2 with timeout of: %s" % self.timeout)
+        logging.debug(
+            "Connecting to Instax %s with timeout of: %s on: tcp://%s:%d"
+            % (self.modelName, self.timeout, self.ip, self.port)
+        )
         self.comms = SocketClientThread()
         self.comms.start()
         self.comms.cmd_q.put(ClientCommand(ClientCommand.CONNECT, [self.ip, self.port]))
-        # Get current time
-        start = int(time.time())
-        while int(time.time()) < (start + self.timeout):
-            try:
-                reply = self.comms.reply_q.get(False)
-                if reply.type == ClientReply.SUCCESS:
-                    return
-                else:
-                    raise (ConnectError(reply.data))
-            except queue.Empty:
-                time.sleep(0.1)
-                pass
-        raise (CommandTimedOutException())
+        try:
+            reply = self.comms.waitForReply(self.timeout)
+        except queue.Empty:
+            raise (CommandTimedOutException())
+        if reply.type != ClientReply.SUCCESS:
+            raise (ConnectError(reply.data))
 
     def send_and_recieve(self, cmdBytes, timeout):
         """Send a command and waits for a response.
@@ -66,29 +120,44 @@ class SP2:
         self.comms.cmd_q.put(ClientCommand(ClientCommand.SEND, cmdBytes))
         self.comms.cmd_q.put(ClientCommand(ClientCommand.RECEIVE))
 
-        # Get current time
-        start = int(time.time())
-        while int(time.time()) < (start + timeout):
-            try:
-                reply = self.comms.reply_q.get(False)
-                if reply.data is not None:
-                    if reply.type == ClientReply.SUCCESS:
-                        return reply
-                    else:
-                        raise (ConnectError(reply.data))
-            except queue.Empty:
-                time.sleep(0.1)
-                pass
-        raise (CommandTimedOutException())
+        try:
+            reply = self.comms.waitForReply(timeout, skipEmpty=True)
+        except queue.Empty:
+            raise (CommandTimedOutException())
+        if reply.type != ClientReply.SUCCESS:
+            raise (ConnectError(reply.data))
+        return reply
+
+    def sendPacket(self, cmdBytes):
+        """Queue a command to be sent without waiting for its response."""
+        self.comms.cmd_q.put(ClientCommand(ClientCommand.SEND, cmdBytes))
+
+    def receivePacket(self, timeout):
+        """Wait for the next response from the printer and decode it."""
+        self.comms.cmd_q.put(ClientCommand(ClientCommand.RECEIVE))
+        try:
+            reply = self.comms.waitForReply(timeout, skipEmpty=True)
+        except queue.Empty:
+            raise (CommandTimedOutException())
+        if reply.type != ClientReply.SUCCESS:
+            raise (ConnectError(reply.data))
+        decodedResponse = self.packetFactory.decode(reply.data)
+        if self.trace:
+            decodedResponse.printDebug()
+        self.status.observe(decodedResponse)
+        return decodedResponse
 
     def sendCommand(self, commandPacket):
         """Send a command packet and returns the response."""
         encodedPacket = commandPacket.encodeCommand(self.currentTimeMillis, self.pinCode)
-        decodedCommand = self.packetFactory.decode(encodedPacket)
-        decodedCommand.printDebug()
-        reply = self.send_and_recieve(encodedPacket, 5)
+        if self.trace:
+            decodedCommand = self.packetFactory.decode(encodedPacket)
+            decodedCommand.printDebug()
+        reply = self.send_and_recieve(encodedPacket, self.commandTimeout)
         decodedResponse = self.packetFactory.decode(reply.data)
-        decodedResponse.printDebug()
+        if self.trace:
+            decodedResponse.printDebug()
+        self.status.observe(decodedResponse)
         return decodedResponse
 
     def getPrinterVersion(self):
@@ -167,86 +236,217 @@ class SP2:
 
     def close(self, timeout=10):
         """Close the connection to the Printer."""
-        logging.debug("Closing connection to Instax SP2")
+        logging.debug("Closing connection to Instax %s" % self.modelName)
         self.comms.cmd_q.put(ClientCommand(ClientCommand.CLOSE))
-        # Get current time
-        start = int(time.time())
-        while int(time.time()) < (start + timeout):
+        try:
+            reply = self.comms.waitForReply(timeout)
+        except queue.Empty:
+            self.comms.join()
+            self.comms = None
+            raise (CommandTimedOutException())
+        if reply.type != ClientReply.SUCCESS:
+            raise (ConnectError(reply.data))
+        self.comms.join()
+        self.comms = None
+
+    def getPrinterInformation(self, maxAge=None):
+        """Primary function to get printer information.
+
+        The model, version and specifications are only asked for once, the
+        battery level and print counts are taken from the last response
+        received unless they are older than maxAge, by default statusTTL.
+        """
+        commands = self.status.getRefreshCommands(maxAge)
+        if commands:
+            connected = self.comms is not None
+            if not connected:
+                self.connect()
+            try:
+                for command in commands:
+                    self.sendCommand(command)
+            finally:
+                if not connected:
+                    self.close()
+        return self.status.getInformation()
+
+    def runPhase(self, phase, action, *args, resume=None):
+        """Run one phase of a print.
+
+        Outside of session mode each phase gets its own connection. In session
+        mode the existing connection is reused, and if the printer drops it
+        the connection is re-established and the phase is run again, up to
+        sessionRetries times. Phases given a resume function call that
+        instead after reconnecting, up to resumeAttempts times, in either
+        mode.
+        """
+        time.sleep(self.phaseDelays.get(phase, 0))
+        if resume is not None:
+            attempts = self.resumeAttempts
+        elif self.sessionMode:
+            resume = action
+            attempts = self.sessionRetries
+        else:
+            attempts = 0
+        if not self.sessionMode:
+            self.connect()
+            try:
+                result = self.retryPhase(phase, action, resume, attempts, *args)
+            except Exception:
+                self.disconnect()
+                raise
+            self.close()
+            return result
+        if self.comms is None:
+            self.connect()
+        return self.retryPhase(phase, action, resume, attempts, *args)
+
+    def retryPhase(self, phase, action, resume, attempts, *args):
+        """Run a phase, reconnecting and calling resume if the connection fails.
+
+        A printer that stops answering is treated the same as one that drops
+        the connection, as a stalled link looks like a timeout.
+        """
+        retries = 0
+        while True:
+            try:
+                return action(*args)
+            except (ConnectError, CommandTimedOutException) as e:
+                if resume is None or retries >= attempts:
+                    self.disconnect()
+                    raise
+                retries += 1
+                logging.info("Connection failed during %s phase (%r), reconnecting" % (phase, e))
+                self.disconnect()
+                self.connect()
+                action = resume
+
+    def disconnect(self):
+        """Tear down a connection that has failed, without a CLOSE handshake."""
+        if self.comms is None:
+            return
+        if self.comms.socket is not None:
             try:
-                reply = self.comms.reply_q.get(False)
-                if reply.type == ClientReply.SUCCESS:
-                    self.comms.join()
-                    self.comms = None
-                    return
-                else:
-                    raise (ConnectError(reply.data))
-            except queue.Empty:
-                time.sleep(0.1)
+                self.comms.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
                 pass
+            self.comms.socket.close()
         self.comms.join()
         self.comms = None
-        raise (CommandTimedOutException())
-
-    def getPrinterInformation(self):
-        """Primary function to get SP-2 information."""
-        self.connect()
-        printerVersion = self.getPrinterVersion()
-        printerModel = self.getPrinterModelName()
-        printerSpecifications = self.getPrinterSpecifications()
-        printCount = self.getPrintCount()
-        printerInformation = {
-            "version": printerVersion.payload,
-            "model": printerModel.payload["modelName"],
-            "battery": printerVersion.header["battery"],
-            "printCount": printerVersion.header["printCount"],
-            "specs": printerSpecifications.payload,
-            "count": printCount.payload["printHistory"],
-        }
-        self.close()
-        return printerInformation
 
-    def printPhoto(self, imageBytes, progress):
-        """Print a Photo to the Printer."""
-        progressTotal = 100
-        progress(0, progressTotal, status="Connecting to instax Printer.           ")
-        # Send Pre Print Commands
-        self.connect()
-        progress(10, progressTotal, status="Connected! - Sending Pre Print Commands.")
+    def prePrintPhase(self):
+        """Send the Pre Print Commands."""
         for x in range(1, 9):
             self.sendPrePrintCommand(x)
-        self.close()
 
-        # Lock The Printer
-        time.sleep(1)
-        self.connect()
-        progress(20, progressTotal, status="Locking Printer for Print.               ")
-        self.sendLockCommand(1)
-        self.close()
+    def getProfile(self):
+        """Return the transfer profile for the connected printer.
 
-        # Reset the Printer
-        time.sleep(1)
-        self.connect()
-        progress(30, progressTotal, status="Resetting Printer.                         ")
-        self.sendResetCommand()
-        self.close()
-
-        # Send the Image
-        time.sleep(1)
-        self.connect()
-        progress(40, progressTotal, status="About to send Image.                       ")
-        self.sendPrepImageCommand(16, 0, 1440000)
-        for segment in range(24):
-            start = segment * 60000
-            end = start + 60000
-            segmentBytes = imageBytes[start:end]
-            self.sendSendImageCommand(segment, bytes(segmentBytes))
-            progress(40 + segment, progressTotal, status=("Sent image segment %s.         " % segment))
+        The firmware version and specifications are only asked for if they
+        have not already been received, and the profile for each firmware is
+        shared between clients, see ProfileCache.
+        """
+        if "version" not in self.status.static:
+            self.getPrinterVersion()
+        firmware = self.status.static["version"]["firmware"]
+        profile = profileCache.get(self.modelName, firmware)
+        if profile is None:
+            if "specs" not in self.status.static:
+                self.getPrinterSpecifications()
+            profile = profileCache.add(self.modelName, firmware, self.status.static["specs"])
+        return profile
+
+    def imagePhase(self, imageBytes, progress, progressTotal=100):
+        """Send the Image to the Printer."""
+        self.profile = self.getProfile()
+        if len(imageBytes) != self.profile.frameLength:
+            raise ValueError(
+                "Image is %d bytes, the %s expects %d" % (len(imageBytes), self.modelName, self.profile.frameLength)
+            )
+        self.transfer = ImageTransfer(imageBytes, self.profile.segmentSize)
+        self.sendImage(progress, progressTotal)
+
+    def resumeImagePhase(self, imageBytes, progress, progressTotal=100):
+        """Carry on sending the image after reconnecting.
+
+        Segments the printer has already acknowledged are not sent again. If
+        the printer rejects the resumed transfer, the image phase is started
+        again from the PrepImage command.
+        """
+        transfer = self.transfer
+        if transfer is None or not transfer.prepared:
+            return self.imagePhase(imageBytes, progress, progressTotal)
+        transfer.resumed += 1
+        logging.info("Resuming image transfer from segment %d" % transfer.nextSegment)
+        try:
+            self.sendImage(progress, progressTotal)
+        except CommandError as e:
+            logging.info("Printer did not accept the resumed transfer (%s), restarting the image" % e)
+            self.imagePhase(imageBytes, progress, progressTotal)
+
+    def sendImage(self, progress, progressTotal=100):
+        """Send the segments of the current transfer that are not yet acknowledged."""
+        transfer = self.transfer
+        if not transfer.prepared:
+            progress(40, progressTotal, status="About to send Image.                       ")
+            self.sendPrepImageCommand(16, 0, self.profile.frameLength)
+            transfer.prepared = True
+        if self.imageWindow > 1:
+            self.sendImageWindowed(progress, progressTotal)
+        else:
+            for segment in transfer.pending():
+                response = self.sendSendImageCommand(segment, transfer.segments[segment])
+                if transfer.resumed and response.header["returnCode"] != Packet.RTN_E_RCV_FRAME:
+                    raise (CommandError("Printer rejected image segment %d" % segment))
+                transfer.acknowledge(segment)
+                progress(40 + segment, progressTotal, status=("Sent image segment %s.         " % segment))
         self.sendT83Command()
-        self.close()
-        progress(70, progressTotal, status="Image Print Started.                       ")
-        # Send Print State Req
-        time.sleep(1)
-        self.connect()
+        self.printStarted = time.monotonic()
+
+    def sendImageWindowed(self, progress, progressTotal=100):
+        """Send the image segments with up to imageWindow of them in flight.
+
+        Responses are matched to segments by their sequenceNumber. If the
+        printer rejects a segment, the answers to every segment in flight are
+        drained and the rest of this transfer is sent one segment at a time.
+        A timeout aborts the window, leaving retryPhase to reconnect and
+        resume from the acknowledged segments.
+        """
+        transfer = self.transfer
+        window = self.imageWindow
+        pending = transfer.pending()
+        inFlight = set()
+        draining = False
+        while pending or inFlight:
+            while pending and len(inFlight) < window and not draining:
+                segment = pending.pop(0)
+                cmdPacket = SendImageCommand(
+                    Packet.MESSAGE_MODE_COMMAND, sequenceNumber=segment, payloadBytes=transfer.segments[segment]
+                )
+                self.sendPacket(cmdPacket.encodeCommand(self.currentTimeMillis, self.pinCode))
+                inFlight.add(segment)
+            response = self.receivePacket(self.commandTimeout)
+            if response.TYPE != Packet.MESSAGE_TYPE_SEND_IMAGE or response.payload["sequenceNumber"] not in inFlight:
+                raise (CommandError("Unexpected response while sending image segments %s" % sorted(inFlight)))
+            sequenceNumber = response.payload["sequenceNumber"]
+            inFlight.remove(sequenceNumber)
+            if response.header["returnCode"] == Packet.RTN_E_RCV_FRAME:
+                transfer.acknowledge(sequenceNumber)
+                progress(
+                    40 + sequenceNumber, progressTotal, status=("Sent image segment %s.         " % sequenceNumber)
+                )
+            elif window == 1:
+                raise (CommandError("Printer rejected image segment %d" % sequenceNumber))
+            elif not draining:
+                logging.warning("Printer rejected pipelined image segments, falling back to a window of 1")
+                draining = True
+            if draining and not inFlight:
+                # Every segment in the window is answered, send the rest one at a time
+                draining = False
+                window = 1
+                pending = transfer.pending()
+
+    def statusPhase(self, progress, progressTotal=100):
+        """Send Print State Requests until the print has finished."""
         self.sendLockStateCommand()
         self.getPrinterVersion()
         self.getPrinterModelName()
@@ -256,14 +456,56 @@ class SP2:
             progress(100, progressTotal, status="Print is complete!                       \n")
         else:
             progress(100, progressTotal, status="Timed out waiting for print..            \n")
-        self.close()
+        return printStatus
+
+    def printPhoto(self, imageBytes, progress):
+        """Print a Photo to the Printer.
+
+        imageBytes can also be a Future that resolves to the encoded image,
+        it is only waited on once the printer is ready to receive the image.
+        Returns True once the printer reports the print is complete.
+        """
+        progressTotal = 100
+        progress(0, progressTotal, status="Connecting to instax Printer.           ")
+        # Send Pre Print Commands
+        progress(10, progressTotal, status="Connected! - Sending Pre Print Commands.")
+        self.runPhase("prePrint", self.prePrintPhase)
+
+        # Lock The Printer
+        progress(20, progressTotal, status="Locking Printer for Print.               ")
+        self.runPhase("lock", self.sendLockCommand, 1)
+
+        # Reset the Printer
+        progress(30, progressTotal, status="Resetting Printer.                         ")
+        self.runPhase("reset", self.sendResetCommand)
+
+        # Send the Image, if it is still being encoded wait for it here so
+        # that the handshake above overlaps with the encoding.
+        if isinstance(imageBytes, Future):
+            imageBytes = imageBytes.result()
+        self.runPhase("image", self.imagePhase, imageBytes, progress, progressTotal, resume=self.resumeImagePhase)
+        progress(70, progressTotal, status="Image Print Started.                       ")
+
+        # Send Print State Req
+        printStatus = self.runPhase("status", self.statusPhase, progress, progressTotal)
+        if self.sessionMode:
+            self.close()
+        return printStatus
 
     def checkPrintStatus(self, timeout=30):
-        """Check the status of a print."""
-        for _ in range(timeout):
-            printStateCmd = self.sendT195Command()
-            if printStateCmd.header["returnCode"] is Packet.RTN_E_RCV_FRAME:
-                return True
-            else:
-                time.sleep(1)
-        return False
+        """Check the status of a print.
+
+        Polls the printer until it reports the print is complete, returning
+        False if it has not within timeout seconds. See PrintMonitor.
+        """
+        return self.printMonitor.waitForPrint(self.modelName, self.sendT195Command, timeout, self.printStarted)
+
+    def watchPrintStatus(self, timeout=30, callback=None):
+        """Check the status of a print in the background.
+
+        Returns a Future that resolves to the result of checkPrintStatus, the
+        client must stay connected and should not be used until it is done.
+        """
+        return self.printMonitor.watch(
+            self.modelName, self.sendT195Command, timeout, self.printStarted, callback=callback
+        )
@@ -0,0 +1,117 @@
+"""Printer Status Cache.
+
+The model name, firmware version and specifications of a printer never
+change, so they only need to be asked for once. The battery level, prints
+remaining and return code are part of the header of every response, so
+they are picked up from whatever commands the client is already sending and
+only asked for again once they are older than a time to live. The lifetime
+print count is kept in the same way, from PrintCountCommand responses.
+"""
+
+import threading
+import time
+
+from instax.packet import (
+    ModelNameCommand,
+    Packet,
+    PrintCountCommand,
+    SpecificationsCommand,
+    VersionCommand,
+)
+
+
+class PrinterStatus:
+    """Cache of printer information, fed by every response a client receives."""
+
+    # Payload field kept for each response type that carries static information
+    staticFields = {
+        Packet.MESSAGE_TYPE_PRINTER_VERSION: "version",
+        Packet.MESSAGE_TYPE_MODEL_NAME: "model",
+        Packet.MESSAGE_TYPE_SPECIFICATIONS: "specs",
+    }
+
+    def __init__(self, ttl=30):
+        """Initialise an empty cache, dynamic fields expire after ttl seconds."""
+        self.ttl = ttl
+        self.static = {}
+        self.header = {}
+        self.count = None
+        self.updated = {"header": None, "count": None}
+        self.lock = threading.Lock()
+
+    def observe(self, response):
+        """Update the cache from a decoded response packet."""
+        if response is None or response.mode != Packet.MESSAGE_MODE_RESPONSE:
+            return
+        now = time.monotonic()
+        with self.lock:
+            header = response.header
+            self.header = {
+                "battery": header["battery"],
+                "printCount": header["printCount"],
+                "returnCode": header["returnCode"],
+                "ejecting": header["ejecting"],
+            }
+            self.updated["header"] = now
+            field = self.staticFields.get(response.TYPE)
+            if field is not None and field not in self.static:
+                self.static[field] = response.payload
+            if response.TYPE == Packet.MESSAGE_TYPE_PRINT_COUNT:
+                self.count = response.payload["printHistory"]
+                self.updated["count"] = now
+
+    def getAge(self, field="header"):
+        """Return the age in seconds of the header or count, None if never seen."""
+        updated = self.updated[field]
+        if updated is None:
+            return None
+        return time.monotonic() - updated
+
+    def getStale(self, maxAge=None):
+        """Return the names of the fields that need to be fetched again.
+
+        These are any static fields that have not been seen yet, and the
+        header or count if they are older than maxAge, by default the ttl.
+        """
+        maxAge = self.ttl if maxAge is None else maxAge
+        stale = [field for field in ("version", "model", "specs") if field not in self.static]
+        for field in ("header", "count"):
+            age = self.getAge(field)
+            if age is None or age > maxAge:
+                stale.append(field)
+        return stale
+
+    def getRefreshCommands(self, maxAge=None):
+        """Return the command packets needed to bring the cache up to date.
+
+        Every response carries a header, so a VersionCommand is only sent
+        for a stale header when no other command is needed.
+        """
+        stale = self.getStale(maxAge)
+        commands = [
+            commandClass(Packet.MESSAGE_MODE_COMMAND)
+            for field, commandClass in (
+                ("version", VersionCommand),
+                ("model", ModelNameCommand),
+                ("specs", SpecificationsCommand),
+                ("count", PrintCountCommand),
+            )
+            if field in stale
+        ]
+        if "header" in stale and not commands:
+            commands.append(VersionCommand(Packet.MESSAGE_MODE_COMMAND))
+        return commands
+
+    def getInformation(self):
+        """Return the cached information in the form of getPrinterInformation."""
+        with self.lock:
+            return {
+                "version": self.static.get("version"),
+                "model": self.static.get("model", {}).get("modelName"),
+                "battery": self.header.get("battery"),
+                "printCount": self.header.get("printCount"),
+                "returnCode": self.header.get("returnCode"),
+                "specs": self.static.get("specs"),
+                "count": self.count,
+                "age": self.getAge(),
+            }
@@ -0,0 +1,13 @@
+"""
+Shared fixtures for the Instax tests.
+"""
+import pytest
+
+from instax.debugServer import DebugServer
+
+
+@pytest.fixture(autouse=True)
+def imageDest(tmp_path, monkeypatch):
+    """Save the images decoded by debug servers to a temporary directory."""
+    monkeypatch.setattr(DebugServer, "defaultDest", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,30 @@
+"""
+Shared helpers for the Instax tests.
+"""
+import threading
+
+from instax.debugServer import DebugServer
+
+test_image = "instax/tests/test_image.png"
+noDelays = {"lock": 0, "reset": 0, "image": 0, "status": 0}
+
+
+def updateProgress(count, total, status=""):
+    pass
+
+
+def startServer(skipPrinting=True, **serverArgs):
+    """Start a DebugServer on a free port in a daemon thread and return it.
+
+    The socket is listening before this returns, so clients can connect
+    straight away. Unless skipPrinting is False the simulated print time is
+    skipped.
+    """
+    server = DebugServer(**dict({"host": "0.0.0.0", "port": 0}, **serverArgs))
+    if skipPrinting:
+        server.printingState = 100
+    server.socket.listen(server.backlog)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    thread.start()
+    return server
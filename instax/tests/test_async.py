@@ -0,0 +1,61 @@
+"""
+Instax SP* Asyncio Client Tests
+"""
+import asyncio
+import unittest
+
+import pytest
+
+from instax.asyncClient import AsyncSP2, AsyncSP3
+from instax.instaxImage import InstaxImage
+from instax.tests.helpers import noDelays, startServer, test_image
+
+
+class AsyncClientTests(unittest.TestCase):
+    """Tests on the asyncio client classes."""
+
+    @pytest.fixture(autouse=True)
+    def debug_servers(self):
+        self.sp2Ports = [startServer(version=2).getPort() for _ in range(3)]
+        self.sp3Port = startServer(version=3).getPort()
+
+    def test_get_printer_info(self):
+        info = asyncio.run(AsyncSP2(ip="0.0.0.0", port=self.sp2Ports[0]).getPrinterInformation())
+        self.assertEqual(info["model"], "SP-2")
+        self.assertEqual(info["count"], 20)
+
+    def test_concurrent_printers(self):
+        async def modelNames():
+            clients = [AsyncSP2(ip="0.0.0.0", port=port) for port in self.sp2Ports]
+            clients.append(AsyncSP3(ip="0.0.0.0", port=self.sp3Port))
+            for client in clients:
+                await client.connect()
+            responses = await asyncio.gather(*(client.getPrinterModelName() for client in clients))
+            await asyncio.gather(*(client.close() for client in clients))
+            return [response.payload["modelName"] for response in responses]
+
+        self.assertEqual(asyncio.run(modelNames()), ["SP-2", "SP-2", "SP-2", "SP-3"])
+
+    def test_print_photo(self):
+        progressLog = []
+
+        def updateProgress(count, total, status=""):
+            progressLog.append({"count": count, "total": total, "status": status})
+
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+
+        async def printPhoto():
+            sp2 = AsyncSP2(ip="0.0.0.0", port=self.sp2Ports[0], sessionMode=True, phaseDelays=noDelays)
+            return await sp2.printPhoto(encodedImage, updateProgress)
+
+        self.assertTrue(asyncio.run(printPhoto()))
+        self.assertEqual(progressLog[-1]["count"], 100)
+        self.assertTrue("Print is complete!" in progressLog[-1]["status"])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Instax Asyncio Debug Server Tests
+"""
+import asyncio
+import socket
+import threading
+import time
+import unittest
+
+import pytest
+
+from instax.asyncClient import AsyncSP2
+from instax.asyncDebugServer import AsyncDebugServer
+from instax.framer import PacketFramer
+from instax.impairment import NetworkImpairment
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet, PacketFactory, SendImageCommand
+from instax.sp2 import SP2
+from instax.sp3 import SP3
+from instax.tests.helpers import noDelays, test_image, updateProgress
+
+printerCount = 100
+sessionTime = 1511267954593
+
+
+class AsyncDebugServerTests(unittest.TestCase):
+    """Tests on many virtual printers served from one event loop."""
+
+    @pytest.fixture(autouse=True)
+    def async_server(self):
+        server = AsyncDebugServer()
+        self.printers = server.addPrinters(printerCount, version=2, total=20)
+        self.printers.append(server.addPrinter(port=0, version=3, latency=0.01))
+        self.printers.append(server.addPrinter(port=0, version=2, impairment=NetworkImpairment(resetChance=1)))
+        self.ports = server.getPorts()
+        threadCount = threading.active_count()
+        thread = threading.Thread(target=server.run)
+        thread.daemon = True
+        thread.start()
+        self.server = server
+        yield server
+        # Every printer is served without a thread of its own
+        self.assertLessEqual(threading.active_count(), threadCount + 2)
+
+    def test_query_every_printer(self):
+        async def queryAll():
+            clients = [AsyncSP2(ip="0.0.0.0", port=port) for port in self.ports[:printerCount]]
+            return await asyncio.gather(*(client.getPrinterInformation() for client in clients))
+
+        start = time.perf_counter()
+        results = asyncio.run(queryAll())
+        print("Queried %d virtual printers in %.3fs" % (len(results), time.perf_counter() - start))
+        self.assertEqual([info["model"] for info in results], ["SP-2"] * printerCount)
+        self.assertEqual({info["count"] for info in results}, {20})
+
+    def test_print_photo(self):
+        instaxImage = InstaxImage(type=3)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+        printer = self.printers[printerCount]
+        printer.printingState = 100
+        sp3 = SP3(ip="0.0.0.0", port=self.ports[printerCount], phaseDelays=noDelays, imageWindow=4)
+        self.assertTrue(sp3.printPhoto(encodedImage, updateProgress))
+        sessionImage = printer.imageMap[sp3.currentTimeMillis & 0xFFFFFFFF]
+        self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), encodedImage)
+
+    def test_dropped_connection(self):
+        printer = self.printers[0]
+        printer.printingState = 100
+        printer.dropSegments = [3]
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        sp2 = SP2(ip="0.0.0.0", port=self.ports[0], phaseDelays=noDelays)
+        self.assertTrue(sp2.printPhoto(instaxImage.encodeImage(), updateProgress))
+        self.assertEqual(sp2.transfer.resumed, 1)
+
+    def sendSegments(self, port, sequenceNumbers):
+        """Send maximum size image segments in a single write."""
+        segment = bytes(range(256)) * 234 + bytes(60000 - 256 * 234)
+        client = socket.create_connection(("127.0.0.1", port), timeout=5)
+        client.sendall(
+            b"".join(
+                SendImageCommand(Packet.MESSAGE_MODE_COMMAND, sequenceNumber=seq, payloadBytes=segment).encodeCommand(
+                    sessionTime, 1111
+                )
+                for seq in sequenceNumbers
+            )
+        )
+        return client, segment
+
+    def test_pipelined_upload(self):
+        client, segment = self.sendSegments(self.ports[1], range(8))
+        framer = PacketFramer()
+        responses = []
+        with client:
+            while len(responses) < 8 and framer.readFrom(client):
+                responses.extend(PacketFactory().decode(packet) for packet in framer.packets())
+        self.assertEqual([response.payload["sequenceNumber"] for response in responses], list(range(8)))
+        self.assertEqual(self.printers[1].imageMap[sessionTime & 0xFFFFFFFF], {seq: segment for seq in range(8)})
+
+    def test_drop_closes_cleanly(self):
+        self.printers[2].dropSegments = [0]
+        client, _ = self.sendSegments(self.ports[2], [0])
+        with client:
+            # A FIN reads as the end of the stream, a reset would raise
+            self.assertEqual(client.recv(100), b"")
+
+    def test_reset_sends_rst(self):
+        client, _ = self.sendSegments(self.ports[-1], [0])
+        with client:
+            with self.assertRaises(ConnectionResetError):
+                client.recv(100)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -502,6 +502,28 @@ class PacketTests(unittest.TestCase):
         self.assertEqual(decodedPacket.payload["sequenceNumber"], sequenceNumber)
         self.assertEqual(decodedPacket.payload["payloadBytes"], payloadBytes)
 
+    def test_encode_cmd_send_segments(self):
+        """Test encoding Send Image Commands from memoryview segments."""
+        sessionTime = int(round(time.time() * 1000))
+        pinCode = 1111
+        imageBytes = bytes(range(256)) * 10
+        segments = list(SendImageCommand.iterSegments(imageBytes, 1000))
+        self.assertEqual([len(segment) for segment in segments], [1000, 1000, 560])
+        for sequenceNumber, segment in enumerate(segments):
+            self.assertIsInstance(segment, memoryview)
+            viewPacket = SendImageCommand(
+                Packet.MESSAGE_MODE_COMMAND, sequenceNumber=sequenceNumber, payloadBytes=segment
+            )
+            bytesPacket = SendImageCommand(
+                Packet.MESSAGE_MODE_COMMAND, sequenceNumber=sequenceNumber, payloadBytes=bytearray(segment)
+            )
+            encodedView = viewPacket.encodeCommand(sessionTime, pinCode)
+            self.assertEqual(encodedView, bytesPacket.encodeCommand(sessionTime, pinCode))
+            decodedPacket = PacketFactory().decode(encodedView)
+            self.assertTrue(decodedPacket.valid)
+            self.assertEqual(decodedPacket.payload["sequenceNumber"], sequenceNumber)
+            self.assertEqual(decodedPacket.payload["payloadBytes"], segment)
+
     def test_encode_resp_send(self):
         """Test encoding a Send Image Response."""
         sessionTime = int(round(time.time() * 1000))
@@ -663,6 +685,42 @@ class PacketTests(unittest.TestCase):
         # Verify Payload
         self.assertEqual(decodedPacket.payload["unknownFourByteInt"], unknownFourByteInt)
 
+    def test_register_packet_type(self):
+        """Test adding a new message type to the factory."""
+
+        class ChangePasswordCommand(Packet):
+            NAME = "Change Password"
+            TYPE = Packet.MESSAGE_TYPE_CHANGE_PASSWORD
+
+            def __init__(self, mode, byteArray=None, newPin=None):
+                super().__init__(mode)
+                self.payload = {}
+                self.mode = mode
+                if byteArray is not None:
+                    self.byteArray = byteArray
+                    self.header = super().decodeHeader(mode, byteArray)
+                    self.valid = self.validatePacket(byteArray, self.header["packetLength"])
+                    self.newPin = self.getTwoByteInt(12, byteArray)
+                    self.payload = {"newPin": self.newPin}
+                else:
+                    self.newPin = newPin
+
+            def encodeComPayload(self):
+                return self.encodeTwoByteInt(self.newPin) + bytearray(2)
+
+        packetFactory = PacketFactory()
+        encodedCommand = ChangePasswordCommand(Packet.MESSAGE_MODE_COMMAND, newPin=4321).encodeCommand(0, 1111)
+        self.assertIsNone(packetFactory.decode(encodedCommand))
+        PacketFactory.register(ChangePasswordCommand)
+        try:
+            decodedPacket = packetFactory.decode(encodedCommand)
+        finally:
+            PacketFactory.unregister(Packet.MESSAGE_TYPE_CHANGE_PASSWORD)
+        self.assertIsInstance(decodedPacket, ChangePasswordCommand)
+        self.assertTrue(decodedPacket.valid)
+        self.assertEqual(decodedPacket.payload["newPin"], 4321)
+        self.assertIs(PacketFactory.packetTypes[Packet.MESSAGE_TYPE_195], Type195Command)
+
 
 if __name__ == "__main__":
 
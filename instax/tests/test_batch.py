@@ -0,0 +1,72 @@
+"""
+Instax Batch Encoder Tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from instax.batch import BatchEncoder
+from instax.pipeline import encodeImageFile
+
+test_image = "instax/tests/test_image.png"
+
+
+class BatchEncoderTests(unittest.TestCase):
+    """Tests on the process pool batch encoder."""
+
+    def setUp(self):
+        self.expected = encodeImageFile(test_image, 2)
+
+    def test_shared_memory(self):
+        with BatchEncoder(type=2, maxWorkers=2) as encoder:
+            frames = list(encoder.encode([test_image] * 4))
+        self.assertEqual(len(frames), 4)
+        for frame in frames:
+            self.assertIsNone(frame.error)
+            self.assertEqual(bytes(frame.data), self.expected)
+            self.assertEqual(set(frame.timings), {"load", "convert", "encode", "total"})
+            frame.release()
+
+    def test_file_backed(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with BatchEncoder(type=2, maxWorkers=2, directory=directory) as encoder:
+                frames = list(encoder.encode([test_image] * 3))
+            for frame in frames:
+                view = frame.data
+                self.assertEqual(view, self.expected)
+                view.release()
+                frame.release()
+            self.assertEqual(os.listdir(directory), [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_failed_image(self):
+        with BatchEncoder(type=2, maxWorkers=1) as encoder:
+            frames = list(encoder.encode(["instax/tests/missing.png", test_image]))
+        failed = [frame for frame in frames if frame.error is not None]
+        self.assertEqual([frame.imagePath for frame in failed], ["instax/tests/missing.png"])
+        for frame in frames:
+            frame.release()
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "Needs /dev/shm to count shared memory blocks")
+    def test_stop_early(self):
+        before = set(os.listdir("/dev/shm"))
+        with BatchEncoder(type=2, maxWorkers=1, queueDepth=2) as encoder:
+            frames = encoder.encode([test_image] * 6)
+            frame = next(frames)
+            # Only the frames in flight have a block, not one for every image
+            self.assertLessEqual(len(set(os.listdir("/dev/shm")) - before), 3)
+            frames.close()
+            frame.release()
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())
+
+    def test_worker_cap(self):
+        encoder = BatchEncoder(maxWorkers=10000)
+        self.assertEqual(encoder.maxWorkers, os.cpu_count())
+
+
+if __name__ == "__main__":
+
+    unittest.main()
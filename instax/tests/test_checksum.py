@@ -0,0 +1,127 @@
+"""
+Instax SP* Checksum Tests
+
+Compares the bulk checksum against the original byte by byte loop and
+prints a small benchmark for each packet type.
+"""
+import timeit
+import unittest
+
+import pytest
+
+from instax.packet import (
+    LockStateCommand,
+    ModelNameCommand,
+    Packet,
+    PacketChecksum,
+    PacketFactory,
+    PrepImageCommand,
+    PrePrintCommand,
+    PrintCountCommand,
+    PrinterLockCommand,
+    ResetCommand,
+    SendImageCommand,
+    SpecificationsCommand,
+    Type83Command,
+    Type195Command,
+    VersionCommand,
+)
+
+sessionTime = 1677412971
+pinCode = 1111
+
+
+def legacyChecksum(byteArray, length):
+    """The original byte by byte checksum loop."""
+    checkSumIndex = 0
+    checkSum = 0
+    while checkSumIndex < length:
+        checkSum += byteArray[checkSumIndex] & 0xFF
+        checkSumIndex += 1
+    return checkSum
+
+
+def samplePackets():
+    """Return an encoded command and response for every packet type."""
+    commands = [
+        SpecificationsCommand(Packet.MESSAGE_MODE_COMMAND),
+        VersionCommand(Packet.MESSAGE_MODE_COMMAND),
+        PrintCountCommand(Packet.MESSAGE_MODE_COMMAND),
+        ModelNameCommand(Packet.MESSAGE_MODE_COMMAND),
+        PrePrintCommand(Packet.MESSAGE_MODE_COMMAND, cmdNumber=1),
+        PrinterLockCommand(Packet.MESSAGE_MODE_COMMAND, lockState=1),
+        ResetCommand(Packet.MESSAGE_MODE_COMMAND),
+        PrepImageCommand(Packet.MESSAGE_MODE_COMMAND, format=16, options=0, imgLength=1440000),
+        SendImageCommand(Packet.MESSAGE_MODE_COMMAND, sequenceNumber=1, payloadBytes=bytes(range(250)) * 240),
+        Type83Command(Packet.MESSAGE_MODE_COMMAND),
+        Type195Command(Packet.MESSAGE_MODE_COMMAND),
+        LockStateCommand(Packet.MESSAGE_MODE_COMMAND),
+    ]
+    responses = [
+        SpecificationsCommand(
+            Packet.MESSAGE_MODE_RESPONSE,
+            unknown1=10,
+            maxMsgSize=60000,
+            unknown2=16,
+            unknown3=0,
+        ),
+        VersionCommand(Packet.MESSAGE_MODE_RESPONSE, unknown1=254, firmware=275, hardware=0),
+        PrintCountCommand(Packet.MESSAGE_MODE_RESPONSE, printHistory=20),
+        ModelNameCommand(Packet.MESSAGE_MODE_RESPONSE, modelName="SP-2"),
+        PrePrintCommand(Packet.MESSAGE_MODE_RESPONSE, cmdNumber=1, respNumber=2),
+        PrinterLockCommand(Packet.MESSAGE_MODE_RESPONSE),
+        ResetCommand(Packet.MESSAGE_MODE_RESPONSE),
+        PrepImageCommand(Packet.MESSAGE_MODE_RESPONSE, maxLen=60000),
+        SendImageCommand(Packet.MESSAGE_MODE_RESPONSE, sequenceNumber=1),
+        Type83Command(Packet.MESSAGE_MODE_RESPONSE),
+        Type195Command(Packet.MESSAGE_MODE_RESPONSE),
+        LockStateCommand(Packet.MESSAGE_MODE_RESPONSE, unknownFourByteInt=100),
+    ]
+    packets = [(cmd.NAME + " Command", cmd.encodeCommand(sessionTime, pinCode)) for cmd in commands]
+    packets += [(resp.NAME + " Response", resp.encodeResponse(sessionTime, 0, 0, 2, 7)) for resp in responses]
+    return packets
+
+
+class ChecksumTests(unittest.TestCase):
+    """Instax Packet Checksum Test Class."""
+
+    def test_checksum_matches_legacy(self):
+        """Test the bulk checksum agrees with the original loop."""
+        for name, encoded in samplePackets():
+            length = len(encoded) - 4
+            self.assertEqual(PacketChecksum(encoded[:length]).total, legacyChecksum(encoded, length), name)
+            self.assertTrue(PacketFactory().decode(encoded).valid, name)
+
+    def test_checksum_incremental(self):
+        """Test that updating over several buffers matches one buffer."""
+        header = bytes(range(12))
+        payload = memoryview(bytes(range(256)) * 4)
+        incremental = PacketChecksum(header)
+        incremental.update(payload[:100]).update(payload[100:])
+        self.assertEqual(incremental.total, PacketChecksum(header + bytes(payload)).total)
+        self.assertEqual(incremental.complement(), PacketChecksum(header, payload).complement())
+
+    def test_checksum_rejects_corrupt_packet(self):
+        """Test that a flipped byte fails validation."""
+        encoded = VersionCommand(Packet.MESSAGE_MODE_COMMAND).encodeCommand(sessionTime, pinCode)
+        encoded[5] ^= 0x01
+        self.assertFalse(PacketFactory().decode(encoded).valid)
+
+    @pytest.mark.benchmark
+    def test_checksum_benchmark(self):
+        """Benchmark the original loop against the bulk checksum."""
+        print("")
+        print("%-26s %8s %12s %12s" % ("Packet", "Bytes", "Loop (us)", "Bulk (us)"))
+        for name, encoded in samplePackets():
+            length = len(encoded) - 4
+            number = 5 if length > 1000 else 500
+            legacy = min(timeit.repeat(lambda: legacyChecksum(encoded, length), number=number, repeat=3)) / number
+            bulk = min(timeit.repeat(lambda: PacketChecksum(encoded[:length]), number=number, repeat=3)) / number
+            print("%-26s %8d %12.1f %12.1f" % (name, len(encoded), legacy * 1e6, bulk * 1e6))
+            if length > 1000:
+                self.assertLess(bulk, legacy, name)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Instax SP* Fleet Dispatcher Tests
+"""
+import socket
+import threading
+import unittest
+
+import pytest
+
+from instax.fleet import FleetPrinter, PrinterFleet, PrintJob
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet
+from instax.tests.helpers import noDelays, startServer, test_image
+
+
+class FleetTests(unittest.TestCase):
+    """Tests on the PrinterFleet dispatcher."""
+
+    @pytest.fixture(autouse=True)
+    def debug_servers(self):
+        self.servers = [startServer(version=2) for _ in range(3)]
+
+    def createFleet(self, ports=None):
+        printers = [
+            FleetPrinter("0.0.0.0", port, version=2, sessionMode=True, phaseDelays=noDelays, retryDelay=0.05)
+            for port in ports or [server.getPort() for server in self.servers]
+        ]
+        return PrinterFleet(printers)
+
+    def waitFor(self, fleet):
+        """Wait for the fleet's jobs, failing rather than hanging if they never finish."""
+        waiter = threading.Thread(target=fleet.wait, daemon=True)
+        waiter.start()
+        waiter.join(30)
+        self.assertFalse(waiter.is_alive())
+        fleet.stop()
+
+    def encodeImage(self):
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        return instaxImage.encodeImage()
+
+    def test_dispatch_jobs(self):
+        fleet = self.createFleet()
+        encodedImage = self.encodeImage()
+        jobs = [fleet.submit(encodedImage) for _ in range(3)]
+        jobs.append(fleet.submit(test_image))
+        fleet.start()
+        fleet.wait()
+        fleet.stop()
+        self.assertEqual([job.state for job in jobs], [PrintJob.COMPLETE] * 4)
+        status = fleet.getStatus()
+        self.assertEqual(sum(printer["jobsPrinted"] for printer in status), 4)
+        self.assertTrue(all(printer["jobsPrinted"] > 0 for printer in status))
+        self.assertTrue(all(printer["returnCode"] == Packet.RTN_E_RCV_FRAME for printer in status))
+
+    def test_skip_empty_printers(self):
+        self.servers[0].returnCode = Packet.RTN_E_FILM_EMPTY
+        self.servers[1].returnCode = Packet.RTN_E_BATTERY_EMPTY
+        fleet = self.createFleet()
+        encodedImage = self.encodeImage()
+        jobs = [fleet.submit(encodedImage) for _ in range(2)]
+        fleet.start()
+        fleet.wait()
+        fleet.stop()
+        self.assertEqual([job.state for job in jobs], [PrintJob.COMPLETE] * 2)
+        self.assertEqual({job.printer for job in jobs}, {fleet.printers[2].name})
+        self.assertEqual([printer["available"] for printer in fleet.getStatus()], [False, False, True])
+
+    def test_fail_when_no_printers(self):
+        for server in self.servers:
+            server.returnCode = Packet.RTN_E_FILM_EMPTY
+        fleet = self.createFleet()
+        encodedImage = self.encodeImage()
+        jobs = [fleet.submit(encodedImage) for _ in range(5)]
+        fleet.start()
+        self.waitFor(fleet)
+        self.assertEqual([job.state for job in jobs], [PrintJob.FAILED] * 5)
+        # Jobs submitted once every printer is gone fail straight away
+        self.assertEqual(fleet.submit(encodedImage).state, PrintJob.FAILED)
+
+    def test_more_jobs_than_printers(self):
+        self.servers[0].returnCode = Packet.RTN_E_FILM_EMPTY
+        self.servers[1].returnCode = Packet.RTN_E_FILM_EMPTY
+        fleet = self.createFleet()
+        encodedImage = self.encodeImage()
+        jobs = [fleet.submit(encodedImage) for _ in range(5)]
+        fleet.start()
+        self.waitFor(fleet)
+        self.assertEqual([job.state for job in jobs], [PrintJob.COMPLETE] * 5)
+        self.assertEqual({job.printer for job in jobs}, {fleet.printers[2].name})
+
+    def closedPort(self):
+        """Return a port that nothing is listening on."""
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            return closed.getsockname()[1]
+
+    def test_unreachable_printer(self):
+        fleet = self.createFleet([self.closedPort(), self.servers[0].getPort()])
+        encodedImage = self.encodeImage()
+        jobs = [fleet.submit(encodedImage) for _ in range(3)]
+        fleet.start()
+        self.waitFor(fleet)
+        self.assertEqual([job.state for job in jobs], [PrintJob.COMPLETE] * 3)
+        status = fleet.getStatus()
+        # The unreachable printer stays in the rotation to be probed again
+        self.assertTrue(status[0]["available"])
+        self.assertGreater(status[0]["failures"], 0)
+        self.assertEqual(status[1]["jobsPrinted"], 3)
+
+    def test_no_reachable_printers(self):
+        fleet = self.createFleet([self.closedPort(), self.closedPort()])
+        jobs = [fleet.submit(self.encodeImage()) for _ in range(2)]
+        fleet.start()
+        self.waitFor(fleet)
+        self.assertEqual([job.state for job in jobs], [PrintJob.FAILED] * 2)
+        self.assertIn("refused", jobs[0].error)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
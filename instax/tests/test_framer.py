@@ -0,0 +1,172 @@
+"""
+Instax Packet Framer Tests
+"""
+import random
+import socket
+import unittest
+
+import pytest
+
+from instax.exceptions import ConnectError
+from instax.framer import PacketFramer
+from instax.packet import ModelNameCommand, Packet, PacketFactory, SendImageCommand, VersionCommand
+from instax.sp2 import SP2
+from instax.tests.helpers import startServer
+
+sessionTime = 1511267954593
+pinCode = 1111
+
+
+def encodeCommands():
+    """Return a few encoded commands of different lengths."""
+    return [
+        VersionCommand(Packet.MESSAGE_MODE_COMMAND).encodeCommand(sessionTime, pinCode),
+        SendImageCommand(
+            Packet.MESSAGE_MODE_COMMAND, sequenceNumber=1, payloadBytes=bytes(range(256)) * 200
+        ).encodeCommand(sessionTime, pinCode),
+        ModelNameCommand(Packet.MESSAGE_MODE_COMMAND).encodeCommand(sessionTime, pinCode),
+    ]
+
+
+class FramerTests(unittest.TestCase):
+    """Tests on the PacketFramer."""
+
+    def test_split_chunks(self):
+        commands = encodeCommands()
+        stream = b"".join(commands)
+        for chunkSize in (1, 3, 7, 1000, len(stream)):
+            framer = PacketFramer()
+            packets = []
+            for i in range(0, len(stream), chunkSize):
+                framer.feed(stream[i : i + chunkSize])
+                packets.extend(bytes(packet) for packet in framer.packets())
+            self.assertEqual(packets, commands)
+            self.assertEqual(len(framer), 0)
+
+    def test_zero_copy_view(self):
+        framer = PacketFramer()
+        command = encodeCommands()[0]
+        framer.feed(command)
+        packet = framer.nextPacket()
+        self.assertIsInstance(packet, memoryview)
+        self.assertTrue(packet.obj is framer.buffer)
+        self.assertEqual(PacketFactory().decode(packet).NAME, "Version")
+
+    def test_compaction(self):
+        # Keep a partial packet pending while the buffer wraps round
+        framer = PacketFramer()
+        imageCommand = encodeCommands()[1]
+        for _ in range(20):
+            framer.feed(imageCommand[:100])
+            self.assertIsNone(framer.nextPacket())
+            framer.feed(imageCommand[100:] + imageCommand[:10])
+            self.assertEqual(bytes(framer.nextPacket()), imageCommand)
+            framer.feed(imageCommand[10:])
+            self.assertEqual(bytes(framer.nextPacket()), imageCommand)
+            self.assertLessEqual(framer.end, framer.capacity)
+
+    def test_pipelined_image(self):
+        # Back to back maximum size image segments, as a windowed client sends them
+        segment = bytes(range(256)) * 234 + bytes(60000 - 256 * 234)
+        commands = [
+            SendImageCommand(Packet.MESSAGE_MODE_COMMAND, sequenceNumber=seq, payloadBytes=segment).encodeCommand(
+                sessionTime, pinCode
+            )
+            for seq in range(32)
+        ]
+        stream = b"".join(commands)
+        rand = random.Random(5)
+        splits = {
+            "fixed": [0x10000] * (len(stream) // 0x10000 + 1),
+            "random": [rand.randint(1, 0x10000) for _ in range(len(stream))],
+        }
+        for name, sizes in splits.items():
+            framer = PacketFramer()
+            packets = []
+            offset = 0
+            for size in sizes:
+                if offset >= len(stream):
+                    break
+                framer.feed(stream[offset : offset + size])
+                offset += size
+                packets.extend(bytes(packet) for packet in framer.packets())
+            self.assertEqual(len(packets), 32, name)
+            self.assertEqual(packets, commands, name)
+
+    def test_read_from_socket(self):
+        commands = encodeCommands()
+        left, right = socket.socketpair()
+        with left, right:
+            left.sendall(b"".join(commands))
+            left.shutdown(socket.SHUT_WR)
+            framer = PacketFramer()
+            packets = []
+            while framer.readFrom(right):
+                packets.extend(bytes(packet) for packet in framer.packets())
+        self.assertEqual(packets, commands)
+
+    def test_invalid_length(self):
+        framer = PacketFramer()
+        framer.feed(b"\x24\x00\x00\x02")
+        with self.assertRaises(ValueError):
+            framer.nextPacket()
+
+    def test_resync_after_invalid_length(self):
+        command = encodeCommands()[0]
+        framer = PacketFramer()
+        framer.feed(b"\x24\x00\x00\x02" + command)
+        with self.assertRaises(ValueError):
+            framer.nextPacket()
+        # The bad packet is skipped rather than failing on every call
+        self.assertEqual(bytes(framer.nextPacket()), command)
+        self.assertEqual(len(framer), 0)
+
+    def test_client_drops_invalid_packets(self):
+        response = VersionCommand(Packet.MESSAGE_MODE_RESPONSE, unknown1=254, firmware=275, hardware=0).encodeResponse(
+            sessionTime, 0, 0, 0, 10
+        )
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            sp2 = SP2(ip="127.0.0.1", port=listener.getsockname()[1])
+            sp2.connect()
+            printer, _ = listener.accept()
+            with printer:
+                printer.sendall(b"\x2a\x00\x00\x02" + response)
+                with self.assertRaises(ConnectError):
+                    sp2.receivePacket(5)
+                # The client closes a connection it can no longer frame
+                self.assertEqual(printer.recv(100), b"")
+            sp2.disconnect()
+
+
+class PipelineServerTests(unittest.TestCase):
+    """Tests sending several commands to the DebugServer in one write."""
+
+    @pytest.fixture(autouse=True)
+    def debug_server(self):
+        server = startServer(skipPrinting=False)
+        self.server_port = server.getPort()
+        yield server
+
+    def connect(self):
+        return socket.create_connection(("127.0.0.1", self.server_port), timeout=5)
+
+    def test_pipelined_commands(self):
+        commands = encodeCommands()
+        with self.connect() as sock:
+            sock.sendall(b"".join(commands))
+            framer = PacketFramer()
+            responses = []
+            while len(responses) < len(commands) and framer.readFrom(sock):
+                responses.extend(PacketFactory().decode(bytes(packet)) for packet in framer.packets())
+        self.assertEqual([response.NAME for response in responses], ["Version", "Send Image", "Model Name"])
+        self.assertEqual(responses[1].payload["sequenceNumber"], 1)
+
+    def test_invalid_packet_drops_client(self):
+        with self.connect() as sock:
+            sock.sendall(b"\x24\x00\x00\x02" + encodeCommands()[0])
+            self.assertEqual(sock.recv(100), b"")
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Instax Encoded Image Cache Tests
+"""
+import mmap
+import os
+import tempfile
+import unittest
+
+from instax.imageCache import EncodedImageCache
+from instax.packet import SendImageCommand
+from instax.pipeline import encodeImageFile
+
+test_image = "instax/tests/test_image.png"
+
+
+class ImageCacheTests(unittest.TestCase):
+    """Tests on the EncodedImageCache."""
+
+    def setUp(self):
+        self.encodeCalls = 0
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def countingEncoder(self, imagePath, **kwargs):
+        self.encodeCalls += 1
+        return encodeImageFile(imagePath, **kwargs)
+
+    def test_memory_hit(self):
+        cache = EncodedImageCache()
+        first = cache.getOrEncode(test_image, self.countingEncoder, type=2)
+        second = cache.getOrEncode(test_image, self.countingEncoder, type=2)
+        self.assertIs(first, second)
+        self.assertEqual(self.encodeCalls, 1)
+        self.assertEqual(len(first), 1440000)
+
+    def test_key_includes_settings(self):
+        cache = EncodedImageCache()
+        keys = {
+            cache.getKey(test_image, 2),
+            cache.getKey(test_image, 3),
+            cache.getKey(test_image, 2, crop_type="top"),
+            cache.getKey(test_image, 2, backgroundColour=(0, 0, 0, 0)),
+        }
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(cache.getKey(test_image, 2), cache.getKey(test_image, 2))
+
+    def test_disk_hit_is_memory_mapped(self):
+        cache = EncodedImageCache(directory=self.tmpDir.name)
+        encoded = cache.getOrEncode(test_image, self.countingEncoder, type=3)
+        # A fresh cache on the same directory should not need to encode again
+        reloaded = EncodedImageCache(directory=self.tmpDir.name)
+        cached = reloaded.getOrEncode(test_image, self.countingEncoder, type=3)
+        self.assertEqual(self.encodeCalls, 1)
+        self.assertIsInstance(cached, mmap.mmap)
+        self.assertEqual(cached[:], encoded)
+        segments = list(SendImageCommand.iterSegments(cached, 60000))
+        self.assertEqual(len(segments), 32)
+        self.assertEqual(segments[5], encoded[300000:360000])
+        for segment in segments:
+            segment.release()
+
+    def test_lru_eviction(self):
+        cache = EncodedImageCache(directory=self.tmpDir.name, maxMemoryBytes=250, maxDiskBytes=250)
+        cache.put("a", bytes(100))
+        cache.put("b", bytes(100))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", bytes(100))
+        self.assertEqual(list(cache.memory), ["a", "c"])
+        self.assertEqual(cache.memoryBytes, 200)
+        self.assertEqual(sorted(os.listdir(self.tmpDir.name)), ["a.instax", "c.instax"])
+        cache.clear()
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(bytes(cache.get("c")), bytes(100))
+
+    def test_disk_tier_mappings(self):
+        cache = EncodedImageCache(directory=self.tmpDir.name, maxMemoryBytes=250, maxDiskBytes=250)
+        cache.put("a", bytes(100))
+        cache.put("b", bytes(100))
+        cache.clear()
+        mapped = cache.get("a")
+        self.assertIsInstance(mapped, mmap.mmap)
+        self.assertIs(cache.get("a"), mapped)
+        # Mapped files are backed by the page cache, not the memory budget
+        self.assertEqual(cache.memoryBytes, 0)
+        self.assertEqual(list(cache.memory), [])
+        cache.put("c", bytes(100))
+        cache.put("d", bytes(100))
+        self.assertNotIn("a", cache.mapped)
+        self.assertTrue(mapped.closed)
+        cache.get("c")
+        cache.clear()
+        self.assertEqual(cache.mapped, {})
+
+
+if __name__ == "__main__":
+
+    unittest.main()
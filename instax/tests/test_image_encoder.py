@@ -3,9 +3,17 @@ Instax SP2 Test File.
 
 @jpwsutton 2016/17
 """
+import os
+import random
+import tempfile
+import time
+import tracemalloc
 import unittest
 
-from instax.instaxImage import InstaxImage
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from instax.instaxImage import InstaxImage, decodePlanar, encodePlanar, encodePlanarInto, reduceImage
 
 
 class ImageTests(unittest.TestCase):
@@ -36,6 +44,131 @@ class ImageTests(unittest.TestCase):
                 message = f"Mismatch: Index: {x}: {rawInstaxBytes[x]} != {encodedImage[x]}"
                 self.fail(message, True)
 
+    def test_encode_returns_bytes(self):
+        """Test that the encoder returns the exact premade bytes."""
+        with open("instax/tests/testEncodedImage.instax", "rb") as infile:
+            rawBytes = infile.read()
+        instaxImage = InstaxImage()
+        instaxImage.decodeImage(bytearray(rawBytes))
+        encodedImage = instaxImage.encodeImage()
+        self.assertIsInstance(encodedImage, bytes)
+        self.assertEqual(encodedImage, rawBytes)
+
+    def test_encode_planar_layout(self):
+        """Test the planar encoder against a per pixel reference."""
+        width, height = 7, 5
+        pixels = [tuple(random.randrange(256) for _ in range(3)) for _ in range(width * height)]
+        image = Image.new("RGB", (width, height))
+        image.putdata(pixels)
+        expected = [None] * (width * height * 3)
+        for h in range(height):
+            for w in range(width):
+                for colour in range(3):
+                    expected[(w * height * 3) + (height * colour) + h] = pixels[(h * width) + w][colour]
+        self.assertEqual(encodePlanar(image), bytes(expected))
+
+    def test_decode_memoryview(self):
+        """Test decoding straight from a memoryview of the segments."""
+        with open("instax/tests/testEncodedImage.instax", "rb") as infile:
+            rawBytes = infile.read()
+        fromBytes = InstaxImage()
+        fromBytes.decodeImage(bytearray(rawBytes))
+        fromView = InstaxImage()
+        fromView.decodeImage(memoryview(rawBytes))
+        self.assertEqual(fromView.myImage.size, (600, 800))
+        self.assertEqual(fromView.getBytes(), fromBytes.getBytes())
+
+    def test_decode_planar_layout(self):
+        """Test the planar decoder reverses the planar encoder."""
+        image = Image.new("RGB", (7, 5))
+        image.putdata([tuple(random.randrange(256) for _ in range(3)) for _ in range(35)])
+        decoded = decodePlanar(memoryview(encodePlanar(image)), 7, 5)
+        self.assertEqual(decoded.tobytes(), image.tobytes())
+
+    def test_reduce_image_covers_print(self):
+        """Test that reduced images still cover the print size."""
+        for size, orientation in (((6000, 4000), 1), ((6000, 4000), 6), ((3000, 3000), 1), ((700, 500), 1)):
+            image = Image.new("RGB", size)
+            exif = image.getexif()
+            exif[0x0112] = orientation
+            with tempfile.TemporaryDirectory() as directory:
+                for format in ("JPEG", "PNG"):
+                    path = os.path.join(directory, "source." + format.lower())
+                    image.save(path, format, exif=exif.tobytes())
+                    reduced = reduceImage(Image.open(path), (800, 600))
+                    reduced.load()
+                    width, height = reduced.size
+                    if orientation == 6:
+                        width, height = height, width
+                    if size == (700, 500):
+                        self.assertEqual(reduced.size, size)
+                    else:
+                        self.assertGreaterEqual(width, 800)
+                        self.assertGreaterEqual(height, 600)
+                        self.assertLess(reduced.width, size[0])
+                    self.assertEqual(reduced.getexif().get(0x0112), orientation)
+
+    @pytest.mark.benchmark
+    def test_reduced_load_benchmark(self):
+        """Compare loading a large phone sized JPEG with and without reduce."""
+        gradient = Image.linear_gradient("L").resize((6000, 4000))
+        image = Image.merge(
+            "RGB", (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient.rotate(180))
+        )
+        exif = image.getexif()
+        exif[0x0112] = 6
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "large.jpg")
+            image.save(path, "JPEG", quality=90, exif=exif.tobytes())
+            timings = {}
+            converted = {}
+            for reduce in (False, True):
+                instaxImage = InstaxImage(type=2)
+                start = time.perf_counter()
+                instaxImage.loadImage(path, reduce=reduce)
+                instaxImage.convertImage()
+                timings[reduce] = time.perf_counter() - start
+                converted[reduce] = instaxImage.myImage
+        print("24MP JPEG load and convert, full: %.3fs, reduced: %.3fs" % (timings[False], timings[True]))
+        self.assertEqual(converted[True].size, converted[False].size)
+        difference = ImageStat.Stat(ImageChops.difference(converted[True], converted[False])).mean
+        self.assertLess(max(difference), 2)
+        self.assertLess(timings[True], timings[False])
+
+    def test_encode_planar_into(self):
+        """Test the striped encoder matches the planar encoder."""
+        image = Image.new("RGB", (7, 5))
+        image.putdata([tuple(random.randrange(256) for _ in range(3)) for _ in range(35)])
+        buffer = bytearray(7 * 5 * 3)
+        self.assertIs(encodePlanarInto(image, buffer, stripeWidth=3), buffer)
+        self.assertEqual(buffer, encodePlanar(image))
+        with self.assertRaises(ValueError):
+            encodePlanarInto(image, bytearray(10))
+
+    def test_low_memory_peak(self):
+        """Low memory encoding puts the frame plus under 10% of it on the Python heap.
+
+        tracemalloc only sees allocations made through Python, not Pillow's
+        pixel buffers, so this is not a measure of the process RSS.
+        """
+        peaks = {}
+        encoded = {}
+        for lowMemory in (False, True):
+            instaxImage = InstaxImage(type=2, lowMemory=lowMemory)
+            instaxImage.loadImage("instax/tests/test_image.png")
+            instaxImage.convertImage()
+            tracemalloc.start()
+            encoded[lowMemory] = instaxImage.encodeImage()
+            peaks[lowMemory] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if lowMemory:
+                self.assertIsNone(instaxImage.sourceImage)
+        print("Encode peak, default: %d bytes, low memory: %d bytes" % (peaks[False], peaks[True]))
+        self.assertIsInstance(encoded[True], bytearray)
+        self.assertEqual(encoded[True], encoded[False])
+        self.assertLess(peaks[True], 1440000 * 1.1)
+        self.assertLess(peaks[True], peaks[False])
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,111 @@
+"""
+Instax Network Impairment Tests
+"""
+import socket
+import time
+import unittest
+
+from instax.exceptions import ConnectError
+from instax.impairment import Link, NetworkImpairment
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet, VersionCommand
+from instax.sp2 import SP2
+from instax.tests.helpers import startServer, test_image, updateProgress
+
+
+class LinkTests(unittest.TestCase):
+    """Tests on the arrival times worked out by a Link."""
+
+    def test_bandwidth_and_delay(self):
+        link = Link(delay=0.1, bandwidth=1000)
+        self.assertAlmostEqual(link.transmit(1000, now=0), 1.1)
+        # The second packet waits for the first to be sent, but not for its delay
+        self.assertAlmostEqual(link.transmit(1000, now=0), 2.1)
+        self.assertAlmostEqual(link.transmit(500, now=5), 5.6)
+
+    def test_jitter_keeps_order(self):
+        link = Link(delay=0.01, jitter=0.5)
+        arrivals = [link.transmit(10, now=index * 0.001) for index in range(100)]
+        self.assertEqual(arrivals, sorted(arrivals))
+
+    def test_stall(self):
+        link = Link(delay=0.1, stallChance=1, stallDuration=2)
+        self.assertAlmostEqual(link.transmit(10, now=0), 2.1)
+
+    def test_profiles(self):
+        impairment = NetworkImpairment.fromProfile("congested", seed=1, resetChance=0.5)
+        self.assertEqual(impairment.uplinkBandwidth, 250000)
+        self.assertEqual(impairment.resetChance, 0.5)
+        with self.assertRaises(ValueError):
+            NetworkImpairment.fromProfile("dialup")
+
+
+class ImpairedServerTests(unittest.TestCase):
+    """Tests clients against a DebugServer on a simulated network."""
+
+    def setUp(self):
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        self.encodedImage = instaxImage.encodeImage()
+
+    def startServer(self, impairment):
+        return startServer(version=2, impairment=impairment)
+
+    def timeImage(self, server, imageWindow=1):
+        sp2 = SP2(ip="0.0.0.0", port=server.getPort(), imageWindow=imageWindow)
+        sp2.connect()
+        sp2.getProfile()
+        start = time.perf_counter()
+        sp2.imagePhase(self.encodedImage, updateProgress)
+        elapsed = time.perf_counter() - start
+        sp2.close()
+        sessionImage = server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+        self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), self.encodedImage)
+        return elapsed
+
+    def test_round_trip_time(self):
+        server = self.startServer(NetworkImpairment(uplinkDelay=0.02, downlinkDelay=0.03))
+        sp2 = SP2(ip="0.0.0.0", port=server.getPort())
+        sp2.connect()
+        start = time.perf_counter()
+        for _ in range(5):
+            sp2.getPrinterVersion()
+        elapsed = time.perf_counter() - start
+        sp2.close()
+        self.assertGreaterEqual(elapsed, 5 * 0.05)
+
+    def test_bandwidth_cap(self):
+        server = self.startServer(NetworkImpairment(uplinkBandwidth=10000000))
+        elapsed = self.timeImage(server)
+        print("Sent %d bytes at 10MB/s in %.3fs" % (len(self.encodedImage), elapsed))
+        self.assertGreaterEqual(elapsed, len(self.encodedImage) / 10000000)
+
+    def test_window_hides_delay(self):
+        sequential = self.timeImage(self.startServer(NetworkImpairment(uplinkDelay=0.02, downlinkDelay=0.02)))
+        windowed = self.timeImage(self.startServer(NetworkImpairment(uplinkDelay=0.02, downlinkDelay=0.02)), 8)
+        print("Image over a 40ms round trip: sequential %.3fs, window of 8 %.3fs" % (sequential, windowed))
+        self.assertGreaterEqual(sequential, 24 * 0.04)
+        self.assertLess(windowed, sequential / 2)
+
+    def test_connection_reset(self):
+        server = self.startServer(NetworkImpairment(resetChance=1))
+        sp2 = SP2(ip="0.0.0.0", port=server.getPort())
+        sp2.connect()
+        with self.assertRaises(ConnectError):
+            sp2.getPrinterVersion()
+        sp2.disconnect()
+
+    def test_reset_sends_rst(self):
+        server = self.startServer(NetworkImpairment(resetChance=1))
+        command = VersionCommand(Packet.MESSAGE_MODE_COMMAND).encodeCommand(1511267954593, 1111)
+        with socket.create_connection(("127.0.0.1", server.getPort()), timeout=5) as client:
+            client.sendall(command)
+            # A FIN would read as the end of the stream instead
+            with self.assertRaises(ConnectionResetError):
+                client.recv(100)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Instax Lazy Packet Tests
+"""
+import json
+import unittest
+
+from instax.debugServer import DebugServer
+from instax.packet import (
+    LazyPacket,
+    Packet,
+    PacketFactory,
+    SendImageCommand,
+    VersionCommand,
+)
+
+
+class LazyPacketTests(unittest.TestCase):
+    """Tests on the LazyPacket view."""
+
+    def loadCorpus(self):
+        with open("instax/tests/replay.json") as json_data:
+            return [bytearray.fromhex(packet["bytes"]) for packet in json.load(json_data)]
+
+    def test_matches_full_decode(self):
+        packetFactory = PacketFactory()
+        for readBytes in self.loadCorpus():
+            fullPacket = packetFactory.decode(readBytes)
+            lazyPacket = packetFactory.decodeLazy(readBytes)
+            self.assertEqual(lazyPacket.TYPE, fullPacket.TYPE)
+            self.assertEqual(lazyPacket.NAME, fullPacket.NAME)
+            self.assertEqual(lazyPacket.packetLength, fullPacket.header["packetLength"])
+            self.assertEqual(lazyPacket.header, fullPacket.header)
+            self.assertEqual(lazyPacket.payload, fullPacket.payload)
+            self.assertTrue(lazyPacket.valid)
+            self.assertEqual(lazyPacket.decode().getPacketObject(), fullPacket.getPacketObject())
+
+    def test_decodes_on_demand(self):
+        lazyPacket = LazyPacket(self.loadCorpus()[0])
+        self.assertFalse(hasattr(lazyPacket, "__dict__"))
+        self.assertIsNone(lazyPacket.decodedHeader)
+        self.assertEqual(lazyPacket.TYPE, Packet.MESSAGE_TYPE_PRE_PRINT)
+        self.assertIsNone(lazyPacket.decodedHeader)
+        self.assertIsNone(lazyPacket.checked)
+        self.assertEqual(lazyPacket.header["password"], 1111)
+        self.assertIsNone(lazyPacket.decodedPayload)
+        self.assertIsNone(lazyPacket.checked)
+
+    def test_payload_bytes_are_views(self):
+        payloadBytes = bytes(range(250)) * 240
+        encoded = SendImageCommand(
+            Packet.MESSAGE_MODE_COMMAND, sequenceNumber=3, payloadBytes=payloadBytes
+        ).encodeCommand(1677412971, 1111)
+        lazyPacket = LazyPacket(encoded)
+        self.assertEqual(lazyPacket.payload["sequenceNumber"], 3)
+        self.assertIsInstance(lazyPacket.payload["payloadBytes"], memoryview)
+        self.assertEqual(lazyPacket.payload["payloadBytes"], payloadBytes)
+        self.assertTrue(lazyPacket.valid)
+        encoded[100] ^= 0xFF
+        self.assertFalse(LazyPacket(encoded).valid)
+
+    def test_unknown_type(self):
+        readBytes = self.loadCorpus()[0]
+        readBytes[1] = Packet.MESSAGE_TYPE_CHANGE_PASSWORD
+        lazyPacket = LazyPacket(readBytes)
+        self.assertEqual(lazyPacket.NAME, "Unknown")
+        self.assertEqual(lazyPacket.header["cmdByte"], Packet.MESSAGE_TYPE_CHANGE_PASSWORD)
+        self.assertEqual(lazyPacket.payload, {})
+
+    def test_debug_server_routing(self):
+        server = DebugServer(host="127.0.0.1", port=0)
+        received = []
+        processVersionCommand = server.processVersionCommand
+
+        def recordVersion(decodedPacket):
+            received.append(decodedPacket)
+            return processVersionCommand(decodedPacket)
+
+        server.registerHandler(Packet.MESSAGE_TYPE_PRINTER_VERSION, recordVersion)
+        command = VersionCommand(Packet.MESSAGE_MODE_COMMAND).encodeCommand(1677412971, 1111)
+        with server.socket:
+            response = server.processIncomingMessage(command)
+            self.assertIsInstance(received[0], LazyPacket)
+            packetFactory = PacketFactory()
+            self.assertEqual(
+                server.messageLog,
+                [packetFactory.decode(command).getPacketObject(), packetFactory.decode(response).getPacketObject()],
+            )
+            # Unknown commands are logged and dropped rather than failing to decode
+            unknown = bytearray(command)
+            unknown[1] = Packet.MESSAGE_TYPE_CHANGE_PASSWORD
+            self.assertIsNone(server.processIncomingMessage(unknown))
+            self.assertEqual(server.messageLog[-1]["header"]["cmdByte"], Packet.MESSAGE_TYPE_CHANGE_PASSWORD)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Instax Adaptive Print Monitor Tests
+"""
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+from instax.monitor import PrintMonitor, PrintWait
+from instax.packet import Packet
+from instax.sp2 import SP2
+from instax.tests.helpers import startServer
+
+printDuration = 0.5
+
+
+class PrintMonitorTests(unittest.TestCase):
+    """Tests on the PrintMonitor polling schedule."""
+
+    def test_expected_duration(self):
+        monitor = PrintMonitor(defaultDuration=12, history=3)
+        self.assertEqual(monitor.expectedDuration("SP-2"), 12)
+        for duration in (8, 9, 30, 10):
+            monitor.record("SP-2", duration)
+        # Only the last three are kept, and the median ignores the outlier
+        self.assertEqual(monitor.expectedDuration("SP-2"), 10)
+        self.assertEqual(monitor.expectedDuration("SP-3"), 12)
+
+    def test_sparse_then_dense(self):
+        monitor = PrintMonitor(defaultDuration=10, minInterval=0.1, maxInterval=2)
+        intervals = [monitor.nextInterval("SP-2", elapsed) for elapsed in (0, 7, 9, 9.8)]
+        self.assertEqual(intervals[0], 2)
+        self.assertEqual(intervals, sorted(intervals, reverse=True))
+        self.assertAlmostEqual(intervals[-1], 0.1)
+
+    def test_backoff_when_overdue(self):
+        monitor = PrintMonitor(defaultDuration=10, minInterval=0.1, maxInterval=2, backoff=2)
+        busy = [monitor.nextInterval("SP-2", 11, polls) for polls in range(1, 7)]
+        self.assertEqual(busy, [0.2, 0.4, 0.8, 1.6, 2, 2])
+
+    def test_wait_schedule(self):
+        monitor = PrintMonitor(defaultDuration=0, minInterval=0.1, maxInterval=2, backoff=2)
+        wait = PrintWait(monitor, "SP-2", timeout=30)
+        # A code that is not known backs off like a busy printer
+        intervals = [wait.update(code) for code in (Packet.RTN_E_PRINTING, Packet.RTN_ST_UPDATE, 0x99)]
+        self.assertEqual(intervals, [0.2, 0.4, 0.8])
+        self.assertIsNone(wait.update(Packet.RTN_E_RCV_FRAME))
+        self.assertTrue(wait.result)
+
+    def test_error_ends_wait(self):
+        monitor = PrintMonitor(defaultDuration=0, minInterval=0.01)
+        codes = iter([Packet.RTN_E_PRINTING, Packet.RTN_E_FILM_EMPTY, Packet.RTN_E_RCV_FRAME])
+
+        def sendStatus():
+            return SimpleNamespace(header={"returnCode": next(codes)})
+
+        self.assertFalse(monitor.waitForPrint("SP-2", sendStatus, timeout=30))
+        self.assertEqual(next(codes), Packet.RTN_E_RCV_FRAME)
+
+    def test_async_wait(self):
+        monitor = PrintMonitor(defaultDuration=0, minInterval=0.01)
+        codes = iter([Packet.RTN_E_PRINTING, Packet.RTN_E_EJECTING, Packet.RTN_E_RCV_FRAME])
+
+        async def sendStatus():
+            return SimpleNamespace(header={"returnCode": next(codes)})
+
+        self.assertTrue(asyncio.run(monitor.waitForPrintAsync("SP-2", sendStatus, timeout=5)))
+        self.assertEqual(len(monitor.durations["SP-2"]), 1)
+
+
+class PrintMonitorServerTests(unittest.TestCase):
+    """Tests the PrintMonitor against a DebugServer with a timed print."""
+
+    @pytest.fixture(autouse=True)
+    def debug_server(self):
+        server = startServer(skipPrinting=False, version=2, printDuration=printDuration)
+        self.server_port = server.getPort()
+        self.server = server
+        yield server
+
+    def startPrint(self, sp2):
+        """Pretend an image has just been sent."""
+        sp2.printStarted = self.server.printStarted = time.monotonic()
+
+    def test_learns_print_duration(self):
+        monitor = PrintMonitor(defaultDuration=5, minInterval=0.02, maxInterval=1)
+        polls = []
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, printMonitor=monitor)
+        sp2.connect()
+
+        def countPolls():
+            polls.append(time.monotonic())
+            return sp2.sendT195Command()
+
+        lags = []
+        for _ in range(3):
+            polls.clear()
+            self.startPrint(sp2)
+            self.assertTrue(monitor.waitForPrint("SP-2", countPolls, 5, sp2.printStarted))
+            lags.append(polls[-1] - sp2.printStarted - printDuration)
+        sp2.close()
+        print("Completion detected %s seconds late, last print took %d polls" % (lags, len(polls)))
+        self.assertAlmostEqual(monitor.expectedDuration("SP-2"), printDuration, delta=0.2)
+        # Once the duration is learned the end of the print is caught quickly
+        # and without polling throughout the print
+        self.assertLess(lags[-1], 0.1)
+        self.assertLess(len(polls), 12)
+
+    def test_timeout(self):
+        monitor = PrintMonitor(defaultDuration=5, minInterval=0.02, maxInterval=0.1)
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, printMonitor=monitor)
+        sp2.connect()
+        self.startPrint(sp2)
+        self.assertFalse(sp2.checkPrintStatus(timeout=0.2))
+        sp2.close()
+
+    def test_watch_print_status(self):
+        results = []
+        done = threading.Event()
+
+        def finished(result):
+            results.append(result)
+            done.set()
+
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, printMonitor=PrintMonitor(defaultDuration=printDuration))
+        sp2.connect()
+        self.startPrint(sp2)
+        future = sp2.watchPrintStatus(timeout=5, callback=finished)
+        self.assertTrue(future.result(timeout=5))
+        self.assertTrue(done.wait(1))
+        sp2.close()
+        self.assertEqual(results, [True])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Instax SP* Print Pipeline Tests
+"""
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from instax.pipeline import PrintPipeline, encodeImageFile
+from instax.sp2 import SP2
+from instax.tests.helpers import noDelays, startServer, test_image
+
+
+class PipelineTests(unittest.TestCase):
+    """Tests on the print pipeline."""
+
+    @pytest.fixture(autouse=True)
+    def debug_server(self):
+        server = startServer(version=2)
+        self.server_port = server.getPort()
+        yield server
+
+    def test_print_image(self):
+        progressLog = []
+
+        def updateProgress(count, total, status=""):
+            progressLog.append(count)
+
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, sessionMode=True, phaseDelays=noDelays)
+        pipeline = PrintPipeline(sp2, type=2)
+        self.assertTrue(pipeline.printImage(test_image, updateProgress))
+        pipeline.shutdown()
+        self.assertEqual(progressLog[-1], 100)
+
+    def test_encode_overlaps_handshake(self):
+        """The image should only be waited on once the handshake is done."""
+        events = []
+        encodedImage = encodeImageFile(test_image, 2)
+
+        def slowEncode():
+            time.sleep(0.5)
+            events.append("encoded")
+            return encodedImage
+
+        def updateProgress(count, total, status=""):
+            if count in (10, 20, 30, 40):
+                events.append(count)
+
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, sessionMode=True, phaseDelays=noDelays)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertTrue(sp2.printPhoto(executor.submit(slowEncode), updateProgress))
+        self.assertEqual(events[:5], [10, 20, 30, "encoded", 40])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
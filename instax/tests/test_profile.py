@@ -0,0 +1,107 @@
+"""
+Instax Printer Profile Tests
+"""
+import unittest
+
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet
+from instax.profile import (
+    MAX_SEGMENT_SIZE,
+    PrinterProfile,
+    ProfileCache,
+    defaultProfiles,
+    profileCache,
+)
+from instax.sp2 import SP2
+from instax.sp3 import SP3
+from instax.tests.helpers import noDelays, startServer, test_image, updateProgress
+
+
+class PrinterProfileTests(unittest.TestCase):
+    """Tests on deriving transfer profiles from specifications."""
+
+    def test_default_profiles(self):
+        self.assertEqual(defaultProfiles["SP-2"].frameLength, 1440000)
+        self.assertEqual(defaultProfiles["SP-2"].segmentCount, 24)
+        self.assertEqual(defaultProfiles["SP-3"].frameLength, 1920000)
+        self.assertEqual(defaultProfiles["SP-3"].segmentCount, 32)
+
+    def test_from_specifications(self):
+        specs = {"maxWidth": 600, "maxHeight": 800, "maxMsgSize": 65000}
+        profile = PrinterProfile.fromSpecifications("SP-2", specs, "01.00")
+        self.assertEqual(profile.segmentCount, 23)
+        # Segments can not be larger than a packet can hold
+        profile = PrinterProfile.fromSpecifications("SP-2", dict(specs, maxMsgSize=0xFFFF))
+        self.assertEqual(profile.segmentSize, MAX_SEGMENT_SIZE)
+        self.assertIsNone(PrinterProfile.fromSpecifications("SP-2", dict(specs, maxMsgSize=0)))
+        # The sizes must match the image the model prints
+        self.assertIsNone(PrinterProfile.fromSpecifications("SP-3", specs))
+
+    def test_cache(self):
+        cache = ProfileCache()
+        self.assertIsNone(cache.get("SP-2", "01.00"))
+        profile = cache.add("SP-2", "01.00", {"maxWidth": 600, "maxHeight": 800, "maxMsgSize": 40000})
+        self.assertIs(cache.get("SP-2", "01.00"), profile)
+        self.assertIsNone(cache.get("SP-2", "01.01"))
+        self.assertIs(cache.add("SP-3", "01.00", {}), defaultProfiles["SP-3"])
+        # An SP-3 reporting the SP-2 image size falls back to the default
+        self.assertIs(
+            cache.add("SP-3", "01.01", {"maxWidth": 600, "maxHeight": 800, "maxMsgSize": 60000}),
+            defaultProfiles["SP-3"],
+        )
+
+
+class NegotiatedTransferTests(unittest.TestCase):
+    """Print against DebugServers reporting different specifications."""
+
+    def setUp(self):
+        profileCache.clear()
+
+    def tearDown(self):
+        profileCache.clear()
+
+    def encodeImage(self, type):
+        instaxImage = InstaxImage(type=type)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        return instaxImage.encodeImage()
+
+    def specificationRequests(self, server):
+        headers = [message["header"] for message in server.messageLog]
+        return sum(
+            1
+            for header in headers
+            if header["startByte"] == Packet.MESSAGE_MODE_COMMAND
+            and header["cmdByte"] == Packet.MESSAGE_TYPE_SPECIFICATIONS
+        )
+
+    def test_larger_messages(self):
+        server = startServer(version=2, maxMsgSize=65000)
+        encodedImage = self.encodeImage(2)
+        for _ in range(2):
+            sp2 = SP2(ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays)
+            self.assertTrue(sp2.printPhoto(encodedImage, updateProgress))
+            sessionImage = server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+            self.assertEqual(len(sessionImage), 23)
+            self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), encodedImage)
+        # The second client reuses the profile negotiated by the first
+        self.assertEqual(self.specificationRequests(server), 1)
+
+    def test_sp3_profile(self):
+        server = startServer(version=3)
+        sp3 = SP3(ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays)
+        self.assertTrue(sp3.printPhoto(self.encodeImage(3), updateProgress))
+        self.assertEqual(sp3.profile.frameLength, 1920000)
+        self.assertEqual(len(server.imageMap[sp3.currentTimeMillis & 0xFFFFFFFF]), 32)
+
+    def test_wrong_image_size(self):
+        server = startServer(version=3)
+        sp3 = SP3(ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays)
+        with self.assertRaises(ValueError):
+            sp3.printPhoto(self.encodeImage(2), updateProgress)
+        self.assertIsNone(sp3.comms)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
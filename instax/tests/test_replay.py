@@ -4,10 +4,21 @@ Instax SP2 Test File.
 @jpwsutton 2016/17
 """
 import json
+import os
+import tempfile
+import time
 import unittest
 from pprint import pprint
 
-from instax.packet import Packet, PacketFactory
+import pytest
+
+from instax.packet import (
+    Packet,
+    PacketFactory,
+    SendImageCommand,
+    Type195Command,
+    VersionCommand,
+)
 
 
 class PacketTests(unittest.TestCase):
@@ -62,8 +73,50 @@ class PacketTests(unittest.TestCase):
             decodedPacketList.append(packetObj)
 
         pprint(decodedPacketList)
-        with open("log2.json", "w") as outfile:
-            json.dump(decodedPacketList, outfile, indent=4)
+        with tempfile.TemporaryDirectory() as logDir:
+            with open(os.path.join(logDir, "log2.json"), "w") as outfile:
+                json.dump(decodedPacketList, outfile, indent=4)
+
+    @pytest.mark.benchmark
+    def test_decode_benchmark(self):
+        """Report how many packets per second the factory can decode."""
+        with open("instax/tests/replay.json") as json_data:
+            corpus = [bytearray.fromhex(packet["bytes"]) for packet in json.load(json_data)]
+        packetFactory = PacketFactory()
+        rounds = 200
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for readBytes in corpus:
+                packetFactory.decode(readBytes)
+        elapsed = time.perf_counter() - start
+        print("Decoded %d packets at %.0f packets per second" % (rounds * len(corpus), rounds * len(corpus) / elapsed))
+        self.assertTrue(all(packetFactory.decode(readBytes).valid for readBytes in corpus))
+
+    def test_header_codec(self):
+        """The struct header codec should match the field by field decode."""
+        with open("instax/tests/replay.json") as json_data:
+            data = json.load(json_data)
+        for packet in data:
+            readBytes = bytearray.fromhex(packet["bytes"])
+            decodedPacket = PacketFactory().decode(readBytes)
+            self.assertEqual(decodedPacket.header, decodedPacket.decodeShortHeader(readBytes[0], readBytes))
+            self.assertEqual(decodedPacket.header, packet["header"])
+
+    @pytest.mark.benchmark
+    def test_status_poll_benchmark(self):
+        """Status polls should cost a small fraction of an image segment to encode and decode."""
+        packetFactory = PacketFactory()
+        segment = SendImageCommand(Packet.MESSAGE_MODE_COMMAND, sequenceNumber=0, payloadBytes=bytes(60000))
+        commands = [packetClass(Packet.MESSAGE_MODE_COMMAND) for packetClass in (Type195Command, VersionCommand)]
+        timings = {}
+        for command, rounds in [(segment, 50)] + [(command, 5000) for command in commands]:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                self.assertTrue(packetFactory.decode(command.encodeCommand(1677412971, 1111)).valid)
+            timings[command.NAME] = (time.perf_counter() - start) / rounds
+            print("%s command encode and decode: %.2f us" % (command.NAME, timings[command.NAME] * 1e6))
+        for command in commands:
+            self.assertLess(timings[command.NAME], timings[segment.NAME] / 10)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ Instax SP* Socket Tests
 James Sutton 2020
 """
 import threading
+import time
 import unittest
 
 import pytest
@@ -36,6 +37,20 @@ class SocketTests(unittest.TestCase):
         sp2.close()
         self.assertEqual("SP-2", model_name)
 
+    def test_command_latency(self):
+        """Replies should be delivered as soon as they arrive, not on a poll interval."""
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port)
+        sp2.connect()
+        sp2.getPrinterModelName()
+        rounds = 20
+        start = time.perf_counter()
+        for _ in range(rounds):
+            sp2.getPrinterModelName()
+        perCommand = (time.perf_counter() - start) / rounds
+        sp2.close()
+        print(f"Average command round trip: {perCommand * 1000:.2f} ms")
+        self.assertLess(perCommand, 0.05)
+
 
 if __name__ == "__main__":
 
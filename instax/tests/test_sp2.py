@@ -4,13 +4,16 @@ Instax SP* Socket Tests
 James Sutton 2020
 """
 import threading
+import time
 import unittest
 
 import pytest
 
 from instax.debugServer import DebugServer
 from instax.instaxImage import InstaxImage
+from instax.packet import Packet, SendImageCommand
 from instax.sp2 import SP2
+from instax.tests.helpers import startServer
 
 test_image = "instax/tests/test_image.png"
 server_batt = 2
@@ -40,6 +43,7 @@ class SP2Tests(unittest.TestCase):
         thread = threading.Thread(target=server.start)
         thread.daemon = True
         thread.start()
+        self.server = server
         yield server
 
     def test_get_printer_info(self):
@@ -68,6 +72,103 @@ class SP2Tests(unittest.TestCase):
         self.assertEqual(progress_log[-1]["count"], 100)
         self.assertTrue("Print is complete!" in progress_log[-1]["status"])
 
+    def test_print_photo_session(self):
+        connections = []
+        listenToClient = self.server.listenToClient
+
+        def countConnections(client, address):
+            connections.append(address)
+            listenToClient(client, address)
+
+        self.server.listenToClient = countConnections
+        sp2 = SP2(
+            ip="0.0.0.0",
+            port=self.server_port,
+            sessionMode=True,
+            phaseDelays={"lock": 0, "reset": 0, "image": 0, "status": 0},
+        )
+
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+        sp2.printPhoto(encodedImage, updateProgress)
+        self.assertEqual(progress_log[-1]["count"], 100)
+        self.assertTrue("Print is complete!" in progress_log[-1]["status"])
+        self.assertEqual(len(connections), 1)
+        self.assertIsNone(sp2.comms)
+
+    @pytest.mark.benchmark
+    def test_print_photo_trace_benchmark(self):
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+        noDelays = {"lock": 0, "reset": 0, "image": 0, "status": 0}
+
+        timings = {}
+        for trace in (True, False):
+            sp2 = SP2(ip="0.0.0.0", port=self.server_port, sessionMode=True, phaseDelays=noDelays, trace=trace)
+            # Skip the simulated print time, only the command exchange is timed
+            self.server.printingState = 100
+            start = time.perf_counter()
+            self.assertTrue(sp2.printPhoto(encodedImage, updateProgress))
+            timings[trace] = time.perf_counter() - start
+        print("printPhoto trace on: %.3fs, trace off: %.3fs" % (timings[True], timings[False]))
+        self.assertLess(timings[False], timings[True])
+
+    @pytest.mark.benchmark
+    def test_windowed_image_benchmark(self):
+        server = startServer(version=2, latency=0.01)
+        port = server.getPort()
+
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+
+        timings = {}
+        for window in (1, 4):
+            sp2 = SP2(ip="0.0.0.0", port=port, imageWindow=window)
+            sp2.connect()
+            start = time.perf_counter()
+            sp2.imagePhase(encodedImage, updateProgress)
+            timings[window] = time.perf_counter() - start
+            sp2.close()
+            sessionImage = server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+            self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), encodedImage)
+        print("imagePhase with 10ms latency, window 1: %.3fs, window 4: %.3fs" % (timings[1], timings[4]))
+        self.assertLess(timings[4], timings[1])
+
+    def test_windowed_image_fallback(self):
+        rejected = []
+        processSendImageCommand = self.server.processSendImageCommand
+
+        def rejectFirstSegment(decodedPacket):
+            if rejected:
+                return processSendImageCommand(decodedPacket)
+            rejected.append(decodedPacket.payload["sequenceNumber"])
+            resPacket = SendImageCommand(Packet.MESSAGE_MODE_RESPONSE, sequenceNumber=rejected[0])
+            return resPacket.encodeResponse(decodedPacket.header["sessionTime"], Packet.RTN_E_OTHER_USED, 0, 2, 10)
+
+        self.server.registerHandler(Packet.MESSAGE_TYPE_SEND_IMAGE, rejectFirstSegment)
+
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, imageWindow=4)
+        sp2.connect()
+        sp2.imagePhase(encodedImage, updateProgress)
+        self.assertEqual(sp2.getPrinterModelName().payload["modelName"], "SP-2")
+        sp2.close()
+        self.assertEqual(rejected, [0])
+        # The fallback only lasts for the one transfer
+        self.assertEqual(sp2.imageWindow, 4)
+        sessionImage = self.server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+        self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), encodedImage)
+
 
 if __name__ == "__main__":
 
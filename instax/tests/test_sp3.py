@@ -40,6 +40,7 @@ class SP3Tests(unittest.TestCase):
         thread = threading.Thread(target=server.start)
         thread.daemon = True
         thread.start()
+        self.server = server
         yield server
 
     def test_get_printer_info(self):
@@ -68,6 +69,32 @@ class SP3Tests(unittest.TestCase):
         self.assertEqual(progress_log[-1]["count"], 100)
         self.assertTrue("Print is complete!" in progress_log[-1]["status"])
 
+    def test_print_photo_session(self):
+        connections = []
+        listenToClient = self.server.listenToClient
+
+        def countConnections(client, address):
+            connections.append(address)
+            listenToClient(client, address)
+
+        self.server.listenToClient = countConnections
+        sp3 = SP3(
+            ip="0.0.0.0",
+            port=self.server_port,
+            sessionMode=True,
+            phaseDelays={"lock": 0, "reset": 0, "image": 0, "status": 0},
+        )
+
+        instaxImage = InstaxImage(type=3)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        encodedImage = instaxImage.encodeImage()
+        sp3.printPhoto(encodedImage, updateProgress)
+        self.assertEqual(progress_log[-1]["count"], 100)
+        self.assertTrue("Print is complete!" in progress_log[-1]["status"])
+        self.assertEqual(len(connections), 1)
+        self.assertIsNone(sp3.comms)
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,110 @@
+"""
+Instax Printer Status Cache Tests
+"""
+import time
+import unittest
+
+import pytest
+
+from instax.packet import Packet, PacketFactory, PrintCountCommand, VersionCommand
+from instax.sp2 import SP2
+from instax.status import PrinterStatus
+from instax.tests.helpers import startServer
+
+
+def makeResponse(commandClass, battery=2, printCount=7, **payload):
+    """Encode and decode a response packet as the printer would send it."""
+    packet = commandClass(Packet.MESSAGE_MODE_RESPONSE, **payload)
+    encoded = packet.encodeResponse(1234, Packet.RTN_E_RCV_FRAME, 0, battery, printCount)
+    return PacketFactory().decode(encoded)
+
+
+class PrinterStatusTests(unittest.TestCase):
+    """Tests on the PrinterStatus cache."""
+
+    def test_observe_header(self):
+        status = PrinterStatus(ttl=30)
+        self.assertEqual(status.getStale(), ["version", "model", "specs", "header", "count"])
+        status.observe(makeResponse(PrintCountCommand, battery=1, printCount=5, printHistory=42))
+        info = status.getInformation()
+        self.assertEqual((info["battery"], info["printCount"], info["count"]), (1, 5, 42))
+        self.assertEqual(status.getStale(), ["version", "model", "specs"])
+        # Any later response refreshes the header
+        status.observe(makeResponse(VersionCommand, battery=0, printCount=4, unknown1=1, firmware=2, hardware=3))
+        self.assertEqual(status.getInformation()["battery"], 0)
+        self.assertEqual(status.getInformation()["version"]["firmware"], "00.02")
+
+    def test_refresh_commands(self):
+        status = PrinterStatus(ttl=30)
+        self.assertEqual(
+            [command.NAME for command in status.getRefreshCommands()],
+            ["Version", "Model Name", "Specifications", "Print Count"],
+        )
+        status.static = {"version": {}, "model": {}, "specs": {}}
+        status.observe(makeResponse(PrintCountCommand, printHistory=1))
+        self.assertEqual(status.getRefreshCommands(), [])
+        # A stale header alone only needs the cheapest command
+        status.updated["header"] -= 60
+        self.assertEqual([command.NAME for command in status.getRefreshCommands()], ["Version"])
+        self.assertEqual([command.NAME for command in status.getRefreshCommands(maxAge=0)], ["Print Count"])
+
+
+class PrinterStatusServerTests(unittest.TestCase):
+    """Tests getPrinterInformation against a DebugServer."""
+
+    @pytest.fixture(autouse=True)
+    def debug_server(self):
+        server = startServer(skipPrinting=False, version=2, battery=2, remaining=10, total=20)
+        self.server_port = server.getPort()
+        self.server = server
+        yield server
+
+    def countCommands(self, sp2):
+        """Record the name of every command the client sends."""
+        sent = []
+        sendCommand = sp2.sendCommand
+
+        def recordCommand(commandPacket):
+            sent.append(commandPacket.NAME)
+            return sendCommand(commandPacket)
+
+        sp2.sendCommand = recordCommand
+        return sent
+
+    def test_cached_information(self):
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, statusTTL=0.2)
+        sent = self.countCommands(sp2)
+        first = sp2.getPrinterInformation()
+        self.assertEqual(len(sent), 4)
+        self.assertEqual(first["model"], "SP-2")
+        self.assertEqual(first["count"], 20)
+
+        start = time.perf_counter()
+        for _ in range(100):
+            info = sp2.getPrinterInformation()
+        elapsed = time.perf_counter() - start
+        print("100 cached status queries took %.4fs" % elapsed)
+        self.assertEqual(len(sent), 4)
+        self.assertEqual(info["battery"], first["battery"])
+
+        time.sleep(0.3)
+        sp2.getPrinterInformation()
+        self.assertEqual(sent[4:], ["Print Count"])
+
+    def test_piggy_back(self):
+        sp2 = SP2(ip="0.0.0.0", port=self.server_port, statusTTL=0.2)
+        sp2.getPrinterInformation()
+        time.sleep(0.3)
+        sent = self.countCommands(sp2)
+        # A status poll refreshes the cached header for free
+        sp2.connect()
+        sp2.sendT195Command()
+        sp2.close()
+        self.assertLess(sp2.status.getAge(), 0.2)
+        sp2.getPrinterInformation()
+        self.assertEqual(sent, ["Type 195", "Print Count"])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
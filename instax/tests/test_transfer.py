@@ -0,0 +1,154 @@
+"""
+Instax Resumable Image Transfer Tests
+"""
+import random
+import unittest
+
+import pytest
+
+from instax.exceptions import ConnectError
+from instax.impairment import Link, NetworkImpairment
+from instax.instaxImage import InstaxImage
+from instax.packet import Packet, SendImageCommand
+from instax.sp2 import SP2
+from instax.tests.helpers import noDelays, startServer, test_image, updateProgress
+from instax.transfer import ImageTransfer
+
+
+class ImageTransferTests(unittest.TestCase):
+    """Tests on the ImageTransfer state object."""
+
+    def test_acknowledge(self):
+        transfer = ImageTransfer(bytes(250), segmentSize=60)
+        self.assertEqual(len(transfer), 5)
+        self.assertEqual(transfer.nextSegment, 0)
+        transfer.acknowledge(0)
+        transfer.acknowledge(2)
+        self.assertEqual(transfer.nextSegment, 1)
+        self.assertEqual(transfer.pending(), [1, 3, 4])
+        transfer.acknowledge(1)
+        self.assertEqual(transfer.lastAcked, 2)
+        self.assertFalse(transfer.complete)
+        transfer.acknowledge(3)
+        transfer.acknowledge(4)
+        self.assertTrue(transfer.complete)
+        transfer.reset()
+        self.assertEqual(transfer.pending(), [0, 1, 2, 3, 4])
+
+
+class FaultInjectionTests(unittest.TestCase):
+    """Drop the connection part way through sending an image."""
+
+    @pytest.fixture(autouse=True)
+    def encoded_image(self):
+        instaxImage = InstaxImage(type=2)
+        instaxImage.loadImage(test_image)
+        instaxImage.convertImage()
+        self.encodedImage = instaxImage.encodeImage()
+        self.segmentCount = len(ImageTransfer(self.encodedImage))
+
+    def printPhoto(self, server, **clientArgs):
+        sp2 = SP2(ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays, **clientArgs)
+        self.assertTrue(sp2.printPhoto(self.encodedImage, updateProgress))
+        sessionImage = server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+        self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), self.encodedImage)
+        return sp2
+
+    def test_resume_random_segments(self):
+        rand = random.Random(17)
+        for sessionMode in (False, True):
+            dropSegments = sorted(rand.sample(range(self.segmentCount), 3))
+            server = startServer(version=2, dropSegments=dropSegments)
+            sp2 = self.printPhoto(server, sessionMode=sessionMode, resumeAttempts=3)
+            self.assertEqual(server.dropSegments, [])
+            self.assertEqual(sp2.transfer.resumed, 3)
+            # Only the dropped segments are sent twice
+            segmentsSent = [message for message in server.messageLog if "payloadBytes" in message["payload"]]
+            self.assertEqual(len(segmentsSent), self.segmentCount + 3)
+
+    def test_resume_windowed(self):
+        dropSegments = sorted(random.Random(3).sample(range(self.segmentCount), 2))
+        server = startServer(version=2, dropSegments=dropSegments)
+        sp2 = self.printPhoto(server, sessionMode=True, imageWindow=4, resumeAttempts=2)
+        self.assertEqual(sp2.transfer.resumed, 2)
+
+    def test_resume_rejected_restarts_image(self):
+        server = startServer(version=2, dropSegments=[10])
+        processSendImageCommand = server.processSendImageCommand
+        rejected = []
+
+        def rejectResume(decodedPacket):
+            sequenceNumber = decodedPacket.payload["sequenceNumber"]
+            if sequenceNumber == 10 and not server.dropSegments and not rejected:
+                rejected.append(sequenceNumber)
+                resPacket = SendImageCommand(Packet.MESSAGE_MODE_RESPONSE, sequenceNumber=sequenceNumber)
+                return resPacket.encodeResponse(decodedPacket.header["sessionTime"], Packet.RTN_E_OTHER_USED, 0, 2, 10)
+            return processSendImageCommand(decodedPacket)
+
+        server.registerHandler(Packet.MESSAGE_TYPE_SEND_IMAGE, rejectResume)
+        prepImage = []
+        processPrepImageCommand = server.processPrepImageCommand
+
+        def countPrepImage(decodedPacket):
+            prepImage.append(decodedPacket)
+            return processPrepImageCommand(decodedPacket)
+
+        server.registerHandler(Packet.MESSAGE_TYPE_PREP_IMAGE, countPrepImage)
+        self.printPhoto(server, sessionMode=True)
+        self.assertEqual(rejected, [10])
+        self.assertEqual(len(prepImage), 2)
+
+    def test_no_resume(self):
+        server = startServer(version=2, dropSegments=[5])
+        sp2 = SP2(ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays, resumeAttempts=0)
+        with self.assertRaises(ConnectError):
+            sp2.printPhoto(self.encodedImage, updateProgress)
+        self.assertIsNone(sp2.comms)
+
+    def resumeAfterStall(self, imageWindow):
+        stalled = []
+
+        class StallingImpairment(NetworkImpairment):
+            """Stall the image connection for a second, part way through the image."""
+
+            def connect(self):
+                connection = super().connect()
+                if len(stalled) < 1:
+                    connection.uplink = StallingLink(stallAt=8)
+                    stalled.append(connection)
+                return connection
+
+        server = startServer(version=2, impairment=StallingImpairment())
+        sp2 = SP2(
+            ip="0.0.0.0", port=server.getPort(), phaseDelays=noDelays, commandTimeout=0.3, imageWindow=imageWindow
+        )
+        sp2.runPhase("image", sp2.imagePhase, self.encodedImage, updateProgress, resume=sp2.resumeImagePhase)
+        self.assertEqual(sp2.transfer.resumed, 1)
+        self.assertTrue(sp2.transfer.complete)
+        sessionImage = server.imageMap[sp2.currentTimeMillis & 0xFFFFFFFF]
+        self.assertEqual(b"".join(sessionImage[key] for key in range(len(sessionImage))), self.encodedImage)
+
+    def test_resume_after_stall(self):
+        self.resumeAfterStall(1)
+
+    def test_resume_windowed_after_stall(self):
+        self.resumeAfterStall(4)
+
+
+class StallingLink(Link):
+    """A link that stalls for a second before its stallAt'th packet."""
+
+    def __init__(self, stallAt):
+        super().__init__(stallDuration=1)
+        self.stallAt = stallAt
+        self.packets = 0
+
+    def transmit(self, length, now=None):
+        self.packets += 1
+        self.stallChance = 1 if self.packets == self.stallAt else 0
+        return super().transmit(length, now)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Image Transfer State.
+
+Keeps track of which segments of an encoded image the printer has
+acknowledged, so that if the connection drops part way through sending an
+image the transfer can carry on from where it stopped instead of starting
+the whole print again.
+"""
+
+from instax.packet import SendImageCommand
+
+
+class ImageTransfer:
+    """Progress of sending an encoded image to the printer."""
+
+    def __init__(self, imageBytes, segmentSize=60000):
+        """Split the image into segments, none of which are acknowledged yet."""
+        self.segments = list(SendImageCommand.iterSegments(imageBytes, segmentSize))
+        self.acked = set()
+        self.lastAcked = -1
+        self.prepared = False
+        self.resumed = 0
+
+    def __len__(self):
+        """Return the number of segments."""
+        return len(self.segments)
+
+    @property
+    def nextSegment(self):
+        """Return the sequenceNumber after the last contiguously acknowledged one."""
+        return self.lastAcked + 1
+
+    @property
+    def complete(self):
+        """Return True once every segment has been acknowledged."""
+        return len(self.acked) == len(self.segments)
+
+    def acknowledge(self, sequenceNumber):
+        """Record that the printer has accepted a segment."""
+        self.acked.add(sequenceNumber)
+        while self.lastAcked + 1 in self.acked:
+            self.lastAcked += 1
+
+    def pending(self):
+        """Return the sequenceNumbers that still need to be sent, in order."""
+        return [sequenceNumber for sequenceNumber in range(len(self.segments)) if sequenceNumber not in self.acked]
+
+    def reset(self):
+        """Forget all progress, so the image is sent again from the start."""
+        self.acked.clear()
+        self.lastAcked = -1
+        self.prepared = False